@@ -1,58 +1,108 @@
-from flask import Flask, request, render_template
-from src.Airbnb.pipelines.Prediction_Pipeline import CustomData, PredictPipeline
+from flask import Flask, request, render_template, jsonify
 from src.Airbnb.database import Database
-import numpy as np
-import pandas as pd
+from src.Airbnb.warmup import Warmup, SkipStep
+from dataclasses import dataclass
+import math
 import os
 
+# pandas, numpy and sklearn are only imported by the warm-up steps below, so that with
+# AIRBNB_LAZY_STARTUP=1 the server can bind before they are loaded.
+
+@dataclass
+class AppConfig:
+    max_batch_size: int = int(os.environ.get("AIRBNB_MAX_BATCH_SIZE", 10000))
+    microbatch_enabled: bool = os.environ.get("AIRBNB_MICROBATCH", "0") == "1"
+    microbatch_max_size: int = int(os.environ.get("AIRBNB_MICROBATCH_MAX_SIZE", 64))
+    microbatch_wait_ms: float = float(os.environ.get("AIRBNB_MICROBATCH_WAIT_MS", 5))
+    db_write_behind: bool = os.environ.get("AIRBNB_DB_WRITE_BEHIND", "0") == "1"
+    similar_listings_mode: str = os.environ.get("AIRBNB_SIMILAR_MODE", "random")
+    similar_listings_radius_km: float = float(os.environ.get("AIRBNB_SIMILAR_RADIUS_KM", 0)) or None
+    lazy_startup: bool = os.environ.get("AIRBNB_LAZY_STARTUP", "0") == "1"
+    warmup_timeout: float = float(os.environ.get("AIRBNB_WARMUP_TIMEOUT", 30))
+
+# Listing used to push one prediction through the full serving path during warm-up.
+WARMUP_LISTING = {
+    'property_type': 'Apartment', 'room_type': 'Entire home/apt', 'amenities': 10, 'accommodates': 2,
+    'bathrooms': 1.0, 'bed_type': 'Real Bed', 'cancellation_policy': 'flexible', 'cleaning_fee': 'True',
+    'city': 'NYC', 'host_has_profile_pic': 't', 'host_identity_verified': 't', 'host_response_rate': 100,
+    'instant_bookable': 'f', 'latitude': 40.73, 'longitude': -73.99, 'number_of_reviews': 10,
+    'review_scores_rating': 95, 'bedrooms': 1, 'beds': 1
+}
+
+config = AppConfig()
 app = Flask(__name__)
-db = Database()
+db = Database(write_behind=config.db_write_behind)
+predict_pipeline = None
+batcher = None
+listings_store = None
 
-try:
-    listings_path = os.path.join("Artifacts", "New_Airbnb_Data.csv")
-    if os.path.exists(listings_path):
-        df_listings = pd.read_csv(listings_path)
-        df_listings['price'] = pd.to_numeric(df_listings['price'], errors='coerce')
-    else:
-        df_listings = None
-        print("Warning: New_Airbnb_Data.csv not found.")
-except Exception as e:
-    df_listings = None
-    print(f"Error loading listings data: {e}")
-
-def get_similar_listings(city, room_type):
-    if df_listings is None:
+def warm_imports():
+    global predict_pipeline, batcher, listings_store
+    from src.Airbnb.pipelines.Prediction_Pipeline import PredictPipeline
+    from src.Airbnb.pipelines.Micro_batching import MicroBatcher
+    from src.Airbnb.listings import ListingsStore
+
+    predict_pipeline = PredictPipeline()
+    batcher = MicroBatcher(
+        predict_pipeline.predict_custom_data,
+        max_batch_size=config.microbatch_max_size,
+        max_wait_ms=config.microbatch_wait_ms
+    ) if config.microbatch_enabled else None
+    listings_store = ListingsStore(os.path.join("Artifacts", "New_Airbnb_Data.csv"),
+                                   build_trees=config.similar_listings_mode == "nearest")
+
+def warm_listings():
+    # Similar listings are optional; without the data file the page just shows none.
+    if not listings_store.available():
+        raise SkipStep("New_Airbnb_Data.csv not found")
+    listings_store.load()
+
+def warm_model():
+    from src.Airbnb.utils.artifact_cache import artifact_cache
+    artifact_cache.get(predict_pipeline.predict_pipeline_config.model_path)
+    predict_pipeline.load_compiled_model()
+
+def warm_preprocessor():
+    # Runs after warm_model, so resolving the model's preprocessor is a cache hit, not a model load.
+    from src.Airbnb.utils.artifact_cache import artifact_cache
+    model = artifact_cache.get(predict_pipeline.predict_pipeline_config.model_path)
+    artifact_cache.get(predict_pipeline.preprocessor_paths(model)[0])
+    predict_pipeline.load_compiled_preprocessor(model)
+
+def warm_prediction():
+    from src.Airbnb.pipelines.Prediction_Pipeline import CustomData
+    predict_pipeline.predict_custom_data([CustomData(**WARMUP_LISTING)])
+
+warmup = Warmup([
+    ("imports", warm_imports),
+    ("listings", warm_listings),
+    ("model", warm_model),
+    ("preprocessor", warm_preprocessor),
+    ("prediction", warm_prediction)
+])
+
+if config.lazy_startup:
+    warmup.start()
+else:
+    warmup.run()
+    for name, component in warmup.components.items():
+        if component['state'] == 'failed':
+            print(f"Warning: warm-up step {name} failed: {component['error']}")
+
+def wait_for_warmup():
+    if not warmup.wait(config.warmup_timeout):
+        raise TimeoutError(f"service is still warming up (waited {config.warmup_timeout:.0f} s)")
+
+def get_similar_listings(city, room_type, latitude=None, longitude=None):
+    listings_index = listings_store.get() if listings_store is not None else None
+    if listings_index is None:
         return []
     
     try:
-        subset = df_listings[
-            (df_listings['city'] == city) & 
-            (df_listings['room_type'] == room_type)
-        ]
-        
-        if subset.empty:
-            return []
-        
-        n = min(5, len(subset))
-        samples = subset.sample(n)
-        
-        results = []
-        for _, row in samples.iterrows():
-            name = row.get('name', 'N/A')
-            if pd.isna(name): name = "Apartment"
-            
-            neigh = row.get('neighbourhood', 'N/A')
-            if pd.isna(neigh) or neigh == "Neighborhood highlights":
-                neigh = f"{city} Area"
-                
-            results.append({
-                'name': name,
-                'neighbourhood': neigh,
-                'price': row.get('price', 'N/A'),
-                'rating': row.get('review_scores_rating', 'N/A')
-            })
-            
-        return results
+        if config.similar_listings_mode == "nearest" and latitude is not None and longitude is not None:
+            return listings_index.nearest(city, room_type, latitude, longitude, k=5,
+                                          radius_km=config.similar_listings_radius_km)
+        return listings_index.sample(city, room_type, k=5)
     except Exception as e:
         print(f"Error getting similar listings: {e}")
         return []
@@ -64,6 +114,9 @@ def home():
     
     if request.method == "POST":
         try:
+            wait_for_warmup()
+            from src.Airbnb.pipelines.Prediction_Pipeline import CustomData
+
             def map_tf(val):
                 return 't' if val == '1' else 'f'
             
@@ -92,16 +145,18 @@ def home():
                 beds=int(request.form.get("beds"))
             )
 
-            final_data = data.get_data_as_dataframe()
-
-            predict_pipeline = PredictPipeline()
-            pred = predict_pipeline.predict(final_data)
+            if batcher is not None:
+                pred = batcher.predict([data])
+            else:
+                pred = predict_pipeline.predict_custom_data([data])
             
-            result = round(np.exp(pred[0]), 2)
+            result = round(math.exp(pred[0]), 2)
             
             similar_listings = get_similar_listings(
                 request.form.get("city"), 
-                request.form.get("room_type")
+                request.form.get("room_type"),
+                latitude=data.latitude,
+                longitude=data.longitude
             )
             
             db.insert_prediction(
@@ -130,5 +185,62 @@ def home():
     else:
         return render_template("index.html", history=history, form_data={})
 
+@app.route("/predict/batch", methods=["POST"])
+def predict_batch():
+    if not warmup.wait(config.warmup_timeout):
+        return jsonify({'error': 'service is still warming up', 'warmup': warmup.report()}), 503
+    import numpy as np
+    from src.Airbnb.pipelines.Prediction_Pipeline import CustomData
+
+    payload = request.get_json(silent=True)
+    records = payload.get("listings") if isinstance(payload, dict) else payload
+    if not isinstance(records, list):
+        return jsonify({'error': 'expected a JSON array of listings or {"listings": [...]}'}), 400
+    if len(records) > config.max_batch_size:
+        return jsonify({'error': f'batch too large: {len(records)} listings (max {config.max_batch_size})'}), 413
+
+    results = [None] * len(records)
+    valid_positions = []
+    valid_items = []
+    for i, record in enumerate(records):
+        try:
+            valid_items.append(CustomData.from_record(record))
+            valid_positions.append(i)
+        except ValueError as e:
+            results[i] = {'index': i, 'error': str(e)}
+
+    if valid_items:
+        try:
+            prices = np.round(np.exp(predict_pipeline.predict_custom_data(valid_items)), 2)
+        except Exception as e:
+            return jsonify({'error': f'Error during prediction: {e}'}), 500
+
+        for i, price in zip(valid_positions, prices.tolist()):
+            results[i] = {'index': i, 'price': price}
+
+    return jsonify({
+        'count': len(records),
+        'failed': len(records) - len(valid_items),
+        'predictions': results
+    })
+
+@app.route("/health", methods=["GET"])
+def health():
+    report = warmup.report()
+    return jsonify(report), 200 if report['status'] == 'ready' else 503
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    if not warmup.done:
+        return jsonify({'warmup': warmup.report()})
+    from src.Airbnb.utils.artifact_cache import artifact_cache
+    return jsonify({
+        'warmup': warmup.report(),
+        'artifacts': artifact_cache.stats(),
+        'micro_batching': batcher.stats() if batcher is not None else None,
+        'database': db.write_stats(),
+        'prediction_cache': predict_pipeline.cache.stats() if predict_pipeline is not None and predict_pipeline.cache is not None else None
+    })
+
 if __name__ == '__main__':
     app.run(host="0.0.0.0", port=8080, debug=True)
@@ -0,0 +1,56 @@
+"""
+Compares two benchmarks.run JSON files benchmark by benchmark (p50 by default).
+
+    python -m benchmarks.compare baseline.json results.json --threshold 1.2
+
+Exits with status 1 when any benchmark got slower than threshold x the baseline.
+"""
+import sys
+import json
+import argparse
+
+
+def _key(entry):
+    return entry['name'], tuple(sorted((key, str(value)) for key, value in entry['params'].items()))
+
+
+def load(file_path):
+    with open(file_path) as f:
+        report = json.load(f)
+    return report['meta'], {_key(entry): entry for entry in report['results']}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('baseline')
+    parser.add_argument('results')
+    parser.add_argument('--stat', default='p50_ms', choices=['mean_ms', 'p50_ms', 'p99_ms', 'min_ms'])
+    parser.add_argument('--threshold', type=float, default=1.2, help='slowdown ratio reported as a regression')
+    args = parser.parse_args(argv)
+
+    old_meta, old = load(args.baseline)
+    new_meta, new = load(args.results)
+    print(f"{args.stat}: {str(old_meta.get('commit'))[:8]} ({old_meta.get('rows')} rows) -> "
+          f"{str(new_meta.get('commit'))[:8]} ({new_meta.get('rows')} rows)")
+
+    regressions = 0
+    for key in sorted(set(old) & set(new)):
+        before, after = old[key][args.stat], new[key][args.stat]
+        ratio = after / before if before > 0 else float('inf')
+        flag = ''
+        if ratio > args.threshold:
+            flag = '  REGRESSION'
+            regressions += 1
+        elif ratio < 1 / args.threshold:
+            flag = '  faster'
+        label = ' '.join(f'{name}={value}' for name, value in key[1])
+        print(f'{key[0]:<40} {label:<48} {before:10.3f} -> {after:10.3f} ms  x{ratio:5.2f}{flag}')
+    for key in sorted(set(old) ^ set(new)):
+        print(f"{key[0]:<40} only in {'baseline' if key in old else 'results'}")
+
+    print(f'{regressions} regression(s) over x{args.threshold}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,256 @@
+"""
+Benchmarks of the training and serving hot paths on synthetic data, written as JSON.
+
+    python -m benchmarks.run --rows 100000 --output results.json
+    python -m benchmarks.compare baseline.json results.json
+
+Everything runs in a scratch working directory (its own Artifacts/ and logs/), so the repo's
+artifacts are never touched. Training stages are timed once with the stage cache disabled;
+serving benchmarks report mean/p50/p99/min milliseconds per call over the trained artifacts.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def time_calls(fn, repeats, warmup=1):
+    for _ in range(warmup):
+        fn()
+    timings = np.empty(repeats)
+    for i in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings[i] = time.perf_counter() - start
+    timings *= 1000
+    return {
+        'repeats': repeats,
+        'mean_ms': float(timings.mean()),
+        'p50_ms': float(np.percentile(timings, 50)),
+        'p99_ms': float(np.percentile(timings, 99)),
+        'min_ms': float(timings.min())
+    }
+
+
+class Results:
+    def __init__(self):
+        self.entries = []
+
+    def add(self, name, stats, **params):
+        self.entries.append(dict(name=name, params=params, **stats))
+        label = ' '.join(f'{key}={value}' for key, value in params.items())
+        print(f"{name:<40} {label:<48} p50 {stats['p50_ms']:10.3f} ms   p99 {stats['p99_ms']:10.3f} ms", flush=True)
+
+    def timed(self, name, fn, repeats, **params):
+        self.add(name, time_calls(fn, repeats), **params)
+
+
+def _repeats(args, batch_size):
+    # Fewer calls for large batches, so each benchmark costs roughly the same.
+    return max(5, args.repeats // max(1, batch_size // 100))
+
+
+def listing_records(df):
+    """CustomData.from_record() inputs for raw listings, with the defaults the web form would send."""
+    from src.Airbnb.pipelines.Prediction_Pipeline import FEATURE_TYPES
+
+    df = df.copy()
+    df['amenity_list'] = df['amenities']
+    df['amenities'] = df['amenities'].astype(str).str.count(',') + 1
+    df['host_response_rate'] = pd.to_numeric(df['host_response_rate'].astype(str).str.rstrip('%'), errors='coerce').fillna(100)
+    df['review_scores_rating'] = df['review_scores_rating'].fillna(95)
+    for column in ('bathrooms', 'bedrooms', 'beds'):
+        df[column] = df[column].fillna(1)
+    df['cleaning_fee'] = df['cleaning_fee'].astype(str)
+    return df[list(FEATURE_TYPES) + ['amenity_list']].to_dict('records')
+
+
+def bench_training(args, results):
+    from src.Airbnb.components.Data_ingestion import DataIngestion
+    from src.Airbnb.components.Data_transformation import DataTransformation
+    from src.Airbnb.components.Model_trainer import ModelTrainer, ModelTrainerConfig
+
+    if args.grid == 'small':
+        ModelTrainerConfig.params = {name: {key: values[:1] for key, values in grid.items()}
+                                     for name, grid in ModelTrainerConfig.params.items()}
+
+    start = time.perf_counter()
+    raw_data_path, split_index_path = DataIngestion().initiate_data_ingestion()
+    results.add('training.data_ingestion', _once(start), rows=args.rows)
+
+    start = time.perf_counter()
+    data_transformation = DataTransformation()
+    train_arr, val_arr, test_arr = data_transformation.initialize_data_transformation(raw_data_path, split_index_path)
+    results.add('training.data_transformation', _once(start), rows=args.rows)
+
+    start = time.perf_counter()
+    ModelTrainer().initate_model_training(train_arr, val_arr, test_arr, data_transformation.load_native_arrays(),
+                                          data_transformation.native_categorical_features())
+    results.add('training.model_training', _once(start), rows=args.rows, grid=args.grid)
+
+
+def _once(start):
+    elapsed = (time.perf_counter() - start) * 1000
+    return {'repeats': 1, 'mean_ms': elapsed, 'p50_ms': elapsed, 'p99_ms': elapsed, 'min_ms': elapsed}
+
+
+def bench_serving(args, results, records):
+    from src.Airbnb.pipelines.Prediction_Pipeline import PredictPipeline, CustomData
+    from src.Airbnb.utils.artifact_cache import artifact_cache
+
+    pipeline = PredictPipeline()
+    pipeline.cache = None
+    model = artifact_cache.get(pipeline.predict_pipeline_config.model_path)
+    preprocessor_path, _ = pipeline.preprocessor_paths(model)
+    preprocessor = artifact_cache.get(preprocessor_path)
+    compiled_preprocessor = pipeline.load_compiled_preprocessor(model)
+    compiled_model = pipeline.load_compiled_model()
+    items = [CustomData.from_record(record) for record in records]
+
+    results.timed('CustomData.get_data_as_dataframe', items[0].get_data_as_dataframe, args.repeats)
+    for batch_size in args.batch_sizes:
+        batch = items[:batch_size]
+        repeats = _repeats(args, batch_size)
+        frame = CustomData.get_batch_as_dataframe(batch)
+        features = preprocessor.transform(frame)
+
+        results.timed('CustomData.get_batch_as_dataframe', lambda: CustomData.get_batch_as_dataframe(batch), repeats,
+                      batch_size=batch_size)
+        results.timed('preprocessor.transform', lambda: preprocessor.transform(frame), repeats, batch_size=batch_size)
+        if compiled_preprocessor is not None:
+            batch_records = [item.to_dict() for item in batch]
+            results.timed('compiled_preprocessor.transform_records',
+                          lambda: compiled_preprocessor.transform_records(batch_records), repeats, batch_size=batch_size)
+            features = compiled_preprocessor.transform_records(batch_records)
+        results.timed('model.predict', lambda: model.predict(features), repeats, batch_size=batch_size,
+                      model=type(model).__name__)
+        if compiled_model is not None:
+            results.timed('compiled_model.predict', lambda: compiled_model.predict(features), repeats,
+                          batch_size=batch_size)
+        results.timed('PredictPipeline.predict', lambda: pipeline.predict(frame), repeats, batch_size=batch_size)
+        results.timed('PredictPipeline.predict_custom_data', lambda: pipeline.predict_custom_data(batch), repeats,
+                      batch_size=batch_size)
+
+
+def bench_similar_listings(args, results, records):
+    sys.path.insert(0, REPO_ROOT)
+    import app
+
+    rng = random.Random(0)
+    queries = [(record['city'], record['room_type'], record['latitude'], record['longitude']) for record in records]
+    for mode in ('random', 'nearest'):
+        app.config.similar_listings_mode = mode
+        results.timed('get_similar_listings', lambda: app.get_similar_listings(*rng.choice(queries)), args.repeats,
+                      mode=mode, listings=args.rows)
+    app.db.close()
+
+
+def bench_database(args, results):
+    from src.Airbnb.database import Database, INSERT_PREDICTION_SQL, _utc_timestamp
+
+    for table_size in args.table_sizes:
+        db = Database(db_name=f'bench_history_{table_size}.db')
+        conn = db.get_connection()
+        with conn:
+            conn.executemany(INSERT_PREDICTION_SQL, (
+                ('NYC', 'Apartment', 'Entire home/apt', 2, 100.0 + i % 50, _utc_timestamp()) for i in range(table_size)
+            ))
+
+        def reload_history():
+            db._history_stale = True
+            db.get_history()
+
+        results.timed('Database.insert_prediction',
+                      lambda: db.insert_prediction('NYC', 'Apartment', 'Entire home/apt', 2, 120.0), args.repeats,
+                      table_size=table_size)
+        results.timed('Database.get_history', db.get_history, args.repeats, table_size=table_size, cached=True)
+        results.timed('Database.get_history', reload_history, args.repeats, table_size=table_size, cached=False)
+        db.close()
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000, help='synthetic listings to generate (10k-10M)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--batch-sizes', type=lambda s: [int(v) for v in s.split(',')], default=[1, 10, 100, 1000, 10000])
+    parser.add_argument('--table-sizes', type=lambda s: [int(v) for v in s.split(',')], default=[1000, 10000, 100000])
+    parser.add_argument('--repeats', type=int, default=200, help='calls per serving benchmark (fewer for large batches)')
+    parser.add_argument('--grid', choices=['small', 'full'], default='small',
+                        help="'small' keeps the first value of each hyperparameter grid")
+    parser.add_argument('--workdir', help='scratch directory (default: a new temporary directory)')
+    parser.add_argument('--output', help='JSON output path (default: benchmark-<commit>-<time>.json in the current directory)')
+    args = parser.parse_args(argv)
+
+    commit = _git_commit()
+    started = datetime.now(timezone.utc)
+    output = os.path.abspath(args.output or f"benchmark-{(commit or 'nogit')[:8]}-{started:%Y%m%dT%H%M%SZ}.json")
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix='airbnb-bench-'))
+
+    # Fresh stages every run, and the app warms up synchronously when imported.
+    os.environ['AIRBNB_STAGE_CACHE'] = '0'
+    os.environ['AIRBNB_LAZY_STARTUP'] = '0'
+    sys.path.insert(0, REPO_ROOT)
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    print(f'Working directory: {workdir}')
+
+    from benchmarks.synthetic_data import write_listings_csv
+    import sklearn
+
+    results = Results()
+    start = time.perf_counter()
+    data_path = write_listings_csv(os.path.join('Artifacts', 'New_Airbnb_Data.csv'), args.rows, args.seed)
+    results.add('synthetic_data.write_listings_csv', _once(start), rows=args.rows)
+
+    bench_training(args, results)
+    sample = pd.read_csv(data_path, nrows=max(args.batch_sizes + [args.repeats]))
+    records = listing_records(sample)
+    records = (records * (max(args.batch_sizes) // len(records) + 1))[:max(args.batch_sizes)]
+    bench_serving(args, results, records)
+    bench_similar_listings(args, results, records)
+    bench_database(args, results)
+
+    report = {
+        'meta': {
+            'commit': commit,
+            'started': started.isoformat(),
+            'rows': args.rows,
+            'seed': args.seed,
+            'grid': args.grid,
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'sklearn': sklearn.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'workdir': workdir
+        },
+        'results': results.entries
+    }
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'Results written to {output}')
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""
+Synthetic listings in the New_Airbnb_Data.csv schema (data_downloader.process_and_merge output),
+so the pipelines and the app can be benchmarked without downloading anything.
+
+    python -m benchmarks.synthetic_data --rows 1000000 --output Artifacts/New_Airbnb_Data.csv
+"""
+import os
+import argparse
+import numpy as np
+import pandas as pd
+
+from src.data_downloader import AirbnbDataDownloader
+
+COLUMNS = AirbnbDataDownloader.KEEP_COLUMNS + ['city', 'log_price']
+
+# city -> (latitude, longitude, price multiplier)
+CITIES = {
+    'NYC': (40.73, -73.95, 1.25), 'LA': (34.05, -118.30, 1.10), 'SF': (37.77, -122.43, 1.40),
+    'DC': (38.90, -77.03, 1.05), 'Chicago': (41.88, -87.63, 0.90), 'Boston': (42.36, -71.06, 1.15)
+}
+PROPERTY_TYPES = ['Apartment', 'House', 'Condominium', 'Townhouse', 'Loft', 'Guest suite', 'Bungalow',
+                  'Entire rental unit', 'Private room in home', 'Boutique hotel', 'Other']
+ROOM_TYPES = {'Entire home/apt': 1.0, 'Private room': 0.55, 'Shared room': 0.35, 'Hotel room': 0.8}
+BED_TYPES = ['Real Bed', 'Futon', 'Pull-out Sofa', 'Airbed', 'Couch']
+CANCELLATION_POLICIES = ['strict', 'moderate', 'flexible', 'super_strict_30', 'super_strict_60']
+AMENITIES = ['Wifi', 'TV', 'Kitchen', 'Heating', 'Air conditioning', 'Washer', 'Dryer', 'Essentials',
+             'Smoke detector', 'Hangers', 'Hair dryer', 'Iron', 'Laptop friendly workspace', 'Shampoo',
+             'Free parking on premises', 'Elevator', 'Gym', 'Pool', 'Hot tub', 'Family/kid friendly',
+             'Carbon monoxide detector', 'Fire extinguisher', 'First aid kit', 'Buzzer/wireless intercom',
+             'Indoor fireplace', 'Pets allowed', 'Self check-in', 'Lockbox', 'Private entrance', 'Cable TV',
+             'Breakfast', 'Dishwasher', 'Microwave', 'Coffee maker', 'Refrigerator', 'Oven', 'Stove',
+             'Bed linens', 'Extra pillows and blankets', 'Patio or balcony', 'Garden or backyard',
+             'Luggage dropoff allowed', 'Long term stays allowed', 'Hot water', 'Cooking basics',
+             'Dishes and silverware', 'Safety card', 'Private living room', 'Room-darkening shades',
+             'Suitable for events']
+
+
+def _amenity_pool(rng, size=2048):
+    """Distinct-looking amenity lists in the '{"Wifi","TV"}' format; rows pick from this pool."""
+    weights = 1.0 / np.arange(1, len(AMENITIES) + 1)
+    weights /= weights.sum()
+    pool, counts = [], []
+    for _ in range(size):
+        k = int(rng.integers(0, 30))
+        picks = rng.choice(len(AMENITIES), size=k, replace=False, p=weights)
+        pool.append('{' + ','.join(f'"{AMENITIES[i]}"' for i in sorted(picks)) + '}')
+        counts.append(k)
+    return np.array(pool, dtype=object), np.array(counts)
+
+
+def _with_missing(rng, values, rate):
+    values = pd.Series(values, dtype=object if values.dtype == object else np.float64)
+    values[rng.random(len(values)) < rate] = np.nan
+    return values
+
+
+def generate_listings(n_rows, seed=0, start_id=0, amenity_pool=None):
+    """One DataFrame of n_rows synthetic listings; log_price depends on city, room type, size and amenities."""
+    rng = np.random.default_rng(seed)
+    pool, pool_counts = amenity_pool if amenity_pool is not None else _amenity_pool(rng)
+
+    city_index = rng.integers(0, len(CITIES), n_rows)
+    city = np.array(list(CITIES))[city_index]
+    centers = np.array(list(CITIES.values()))[city_index]
+    room_names = np.array(list(ROOM_TYPES))
+    room_type = room_names[rng.choice(len(room_names), n_rows, p=[0.55, 0.38, 0.04, 0.03])]
+    accommodates = np.clip(rng.poisson(2.2, n_rows) + 1, 1, 16)
+    bedrooms = np.clip(np.round(accommodates / 2 + rng.normal(0, 0.5, n_rows)), 0, 10)
+    beds = np.clip(bedrooms + rng.integers(0, 2, n_rows), 1, 16)
+    bathrooms = np.clip(np.round(bedrooms / 2 + rng.normal(0.75, 0.3, n_rows)), 0.5, 8)
+    amenity_index = rng.integers(0, len(pool), n_rows)
+    rating = np.clip(np.round(rng.normal(94, 6, n_rows)), 20, 100)
+    latitude = centers[:, 0] + rng.normal(0, 0.06, n_rows)
+    longitude = centers[:, 1] + rng.normal(0, 0.08, n_rows)
+
+    log_price = (3.4 + np.log(centers[:, 2]) + np.log([ROOM_TYPES[name] for name in room_type])
+                 + 0.12 * accommodates + 0.08 * bathrooms + 0.01 * pool_counts[amenity_index]
+                 + 0.004 * (rating - 94) + rng.normal(0, 0.3, n_rows))
+    price = np.round(np.exp(log_price), 2)
+
+    df = pd.DataFrame({
+        'id': np.arange(start_id, start_id + n_rows),
+        'name': np.char.add(np.array(['Cozy ', 'Sunny ', 'Modern ', 'Quiet ', 'Spacious '])[rng.integers(0, 5, n_rows)],
+                            np.array(['studio', 'loft', 'home', 'room', 'apartment'])[rng.integers(0, 5, n_rows)]),
+        'neighbourhood': _with_missing(rng, np.char.add('District ', rng.integers(1, 40, n_rows).astype(str)).astype(object), 0.1),
+        'property_type': np.array(PROPERTY_TYPES)[rng.integers(0, len(PROPERTY_TYPES), n_rows)],
+        'room_type': room_type,
+        'amenities': pool[amenity_index],
+        'accommodates': accommodates,
+        'bathrooms': _with_missing(rng, bathrooms, 0.01),
+        'bed_type': np.array(BED_TYPES)[rng.choice(len(BED_TYPES), n_rows, p=[0.9, 0.04, 0.03, 0.02, 0.01])],
+        'cancellation_policy': np.array(CANCELLATION_POLICIES)[rng.choice(len(CANCELLATION_POLICIES), n_rows, p=[0.4, 0.3, 0.28, 0.01, 0.01])],
+        'cleaning_fee': np.where(rng.random(n_rows) < 0.75, 'True', 'False'),
+        'host_has_profile_pic': np.where(rng.random(n_rows) < 0.99, 't', 'f'),
+        'host_identity_verified': np.where(rng.random(n_rows) < 0.7, 't', 'f'),
+        'host_response_rate': _with_missing(rng, np.char.add(np.clip(np.round(rng.normal(95, 10, n_rows)), 0, 100).astype(int).astype(str), '%').astype(object), 0.2),
+        'instant_bookable': np.where(rng.random(n_rows) < 0.3, 't', 'f'),
+        'latitude': np.round(latitude, 6),
+        'longitude': np.round(longitude, 6),
+        'number_of_reviews': rng.negative_binomial(1, 0.05, n_rows),
+        'review_scores_rating': _with_missing(rng, rating, 0.2),
+        'bedrooms': _with_missing(rng, bedrooms, 0.01),
+        'beds': _with_missing(rng, beds, 0.01),
+        'price': price,
+        'city': city,
+        'log_price': np.log(price)
+    })
+    return df[COLUMNS]
+
+
+def write_listings_csv(file_path, n_rows, seed=0, chunk_size=200000):
+    """Writes n_rows listings in chunks, so memory stays bounded for 10M-row files."""
+    os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+    amenity_pool = _amenity_pool(np.random.default_rng(seed))
+    with open(file_path + '.tmp', 'w', newline='') as f:
+        for i, start in enumerate(range(0, n_rows, chunk_size)):
+            chunk = generate_listings(min(chunk_size, n_rows - start), seed=seed + 1 + i, start_id=start,
+                                      amenity_pool=amenity_pool)
+            chunk.to_csv(f, header=i == 0, index=False)
+    os.replace(file_path + '.tmp', file_path)
+    return file_path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=os.path.join('Artifacts', 'New_Airbnb_Data.csv'))
+    args = parser.parse_args()
+    write_listings_csv(args.output, args.rows, args.seed)
+    print(f'{args.rows} rows written to {args.output}')
@@ -0,0 +1,47 @@
+import gc
+import os
+import sys
+import multiprocessing
+
+# Production entry point: gunicorn -c gunicorn.conf.py app:app
+#
+# The app is imported once in the master (preload_app), which runs the warm-up steps and loads the
+# model, preprocessor and listings index before the workers are forked, so their pages are shared
+# copy-on-write. kill -HUP <master> restarts the workers gracefully; since the app is preloaded,
+# new code needs a full restart, while new artifacts are picked up by the workers from the file mtime.
+
+bind = os.environ.get("AIRBNB_BIND", "0.0.0.0:8080")
+workers = int(os.environ.get("AIRBNB_WORKERS", multiprocessing.cpu_count()))
+threads = int(os.environ.get("AIRBNB_THREADS", 1))
+timeout = int(os.environ.get("AIRBNB_WORKER_TIMEOUT", 60))
+graceful_timeout = int(os.environ.get("AIRBNB_GRACEFUL_TIMEOUT", 30))
+max_requests = int(os.environ.get("AIRBNB_MAX_REQUESTS", 10000))
+max_requests_jitter = int(os.environ.get("AIRBNB_MAX_REQUESTS_JITTER", max_requests // 10))
+preload_app = True
+accesslog = "-"
+
+# Micro-batching only pays off with concurrent requests in a worker: with one thread per worker
+# every request would sit out the collection window alone, so it is turned off before the app loads.
+_microbatch_refused = os.environ.get("AIRBNB_MICROBATCH", "0") == "1" and threads < 2
+if _microbatch_refused:
+    os.environ["AIRBNB_MICROBATCH"] = "0"
+
+# Threads do not survive fork, so the background warm-up must not run in the master.
+os.environ["AIRBNB_LAZY_STARTUP"] = "0"
+
+# One BLAS/OpenMP thread per worker thread; parallelism comes from the workers.
+for name in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+    os.environ.setdefault(name, "1")
+
+
+def when_ready(server):
+    if _microbatch_refused:
+        server.log.warning("AIRBNB_MICROBATCH=1 ignored: it needs AIRBNB_THREADS >= 2 to have requests to batch")
+    app_module = sys.modules.get("app")
+    if app_module is not None:
+        # Workers open their own SQLite connections; do not carry the master's across fork.
+        app_module.db.close()
+        if not app_module.warmup.ready:
+            server.log.warning(f"Warm-up incomplete: {app_module.warmup.report()['components']}")
+    # Keep the cyclic GC from touching (and so copying) the preloaded objects in every worker.
+    gc.freeze()
@@ -0,0 +1,143 @@
+import re
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.base import BaseEstimator, TransformerMixin
+
+# Inside Airbnb stores amenities as '{"Wifi","TV"}' (old dumps) or '["Wifi", "TV"]' (new ones).
+_AMENITY_NOISE_RE = re.compile(r'[{}\[\]"]')
+
+
+# ASCII record separator; not '\x00', which pandas' string hashtable confuses with ''.
+_ROW_SEPARATOR = '\x1e'
+
+
+def _clean_token(token):
+    return _AMENITY_NOISE_RE.sub('', token).lower().strip()
+
+
+def _is_missing(value):
+    return value is None or value != value or (isinstance(value, str) and value == '')
+
+
+def amenity_tokens(value):
+    """Tokens of one amenity list (str, list or tuple), [] for an empty list; None if the list is missing."""
+    if _is_missing(value):
+        return None
+    if isinstance(value, (list, tuple)):
+        value = ','.join(str(item) for item in value)
+    tokens = [_clean_token(token) for token in str(value).split(',')]
+    return [token for token in tokens if token]
+
+
+def _as_strings(X):
+    """The amenity lists as strings, and a mask of the missing ones (None, NaN or '')."""
+    if isinstance(X, pd.DataFrame):
+        X = X.iloc[:, 0]
+    elif not isinstance(X, pd.Series):
+        X = np.asarray(X, dtype=object)
+        X = X[:, 0] if X.ndim == 2 else X
+    values = pd.Series(X, dtype=object).reset_index(drop=True)
+    missing = (values.isna() | (values == '')).to_numpy()
+    if pd.api.types.infer_dtype(values, skipna=True) in ('string', 'empty'):
+        return values.where(~missing, ''), missing
+    lists = [i for i, value in enumerate(values) if isinstance(value, (list, tuple))]
+    if lists:
+        values.iloc[lists] = [','.join(str(item) for item in values.iloc[i]) for i in lists]
+    return values.where(~missing, '').astype(str), missing
+
+
+def _token_codes(X):
+    """
+    Row position and code of every amenity token, the distinct cleaned tokens, the number of rows
+    and the mask of rows whose list is missing. All rows are split in one pass over the joined text
+    and factorized; cleaning (quotes, brackets, case, whitespace) is applied to the distinct raw
+    tokens only, not per row.
+    """
+    values, missing = _as_strings(X)
+    n_rows = len(values)
+    if n_rows == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0, dtype=object), 0, missing
+
+    raw_codes, raw_tokens = pd.factorize(np.array(f',{_ROW_SEPARATOR},'.join(values).split(','), dtype=object))
+    separator = raw_tokens.tolist().index(_ROW_SEPARATOR) if n_rows > 1 else -1
+    is_separator = raw_codes == separator
+    rows = np.cumsum(is_separator)[~is_separator]
+    raw_codes = raw_codes[~is_separator]
+
+    codes, uniques = pd.factorize(np.array([_clean_token(token) for token in raw_tokens], dtype=object))
+    codes = codes[raw_codes]
+    empty = np.flatnonzero(uniques == '')
+    if len(empty):
+        keep = codes != empty[0]
+        rows, codes = rows[keep], codes[keep]
+    return rows, codes, uniques, n_rows, missing
+
+
+def _row_matrix(rows, columns, values, n_rows, n_columns):
+    """CSR matrix from entries whose row positions are already sorted; duplicates are summed."""
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+    matrix = sparse.csr_matrix((values, columns, indptr), shape=(n_rows, n_columns))
+    matrix.sum_duplicates()
+    return matrix
+
+
+class AmenityFeaturizer(BaseEstimator, TransformerMixin):
+    """
+    Multi-hot encoding of the top_k most common amenities (by number of listings), as a CSR matrix.
+    Rows whose amenity list is missing get the training frequency of each amenity instead of zeros;
+    an empty list ('{}') is encoded as zeros.
+    """
+
+    def __init__(self, top_k=50):
+        self.top_k = top_k
+
+    def fit(self, X, y=None):
+        self._fit_codes(*_token_codes(X))
+        return self
+
+    def transform(self, X):
+        return self._transform_codes(*_token_codes(X))
+
+    def fit_transform(self, X, y=None):
+        # Tokenizing dominates the cost, so fit and transform share one pass.
+        token_codes = _token_codes(X)
+        self._fit_codes(*token_codes)
+        return self._transform_codes(*token_codes)
+
+    def _fit_codes(self, rows, codes, uniques, n_rows, missing):
+        presence = _row_matrix(rows, codes, np.ones(len(rows)), n_rows, len(uniques))
+        listings_per_token = np.bincount(presence.indices, minlength=len(uniques))
+
+        order = sorted(range(len(uniques)), key=lambda i: (-listings_per_token[i], uniques[i]))
+        order = [i for i in order if uniques[i] != ''][:self.top_k]
+        # Frequencies among the listings that report a list, empty lists included.
+        n_present = max(int(n_rows - np.count_nonzero(missing)), 1)
+
+        self.vocabulary_ = [uniques[i] for i in order]
+        self.frequencies_ = listings_per_token[order].astype(np.float64) / n_present
+        self.n_features_in_ = 1
+
+    def _transform_codes(self, rows, codes, uniques, n_rows, missing):
+        n_tokens = len(self.vocabulary_)
+        index = {token: j for j, token in enumerate(self.vocabulary_)}
+        remap = np.array([index.get(token, -1) for token in uniques], dtype=np.int64)
+        columns = remap[codes] if len(codes) else codes
+        known = columns >= 0
+
+        matrix = _row_matrix(rows[known], columns[known], np.ones(int(known.sum())), n_rows, n_tokens)
+        matrix.data[:] = 1.0
+
+        missing_rows = np.flatnonzero(missing)
+        if len(missing_rows) and n_tokens:
+            fill = sparse.csr_matrix((
+                np.tile(self.frequencies_, len(missing_rows)),
+                (np.repeat(missing_rows, n_tokens), np.tile(np.arange(n_tokens), len(missing_rows)))
+            ), shape=(n_rows, n_tokens))
+            matrix = matrix + fill
+        return matrix.tocsr()
+
+    def get_feature_names_out(self, input_features=None):
+        return np.array([f'amenity_{token}' for token in self.vocabulary_], dtype=object)
@@ -0,0 +1,194 @@
+import os
+import sys
+import time
+import numpy as np
+from scipy import sparse
+from src.Airbnb.logger import logging
+from src.Airbnb.exception import customexception
+from src.Airbnb.utils.utils import save_object, file_digest
+
+from sklearn.ensemble import RandomForestRegressor, ExtraTreesRegressor, GradientBoostingRegressor
+from sklearn.tree import DecisionTreeRegressor
+from sklearn.dummy import DummyRegressor
+
+
+class NotCompilableError(Exception):
+    """The model is not a tree ensemble CompiledTreeEnsemble can reproduce; serve it with model.predict."""
+
+
+class CompiledTreeEnsemble:
+    """
+    Flat-array version of a fitted sklearn tree ensemble.
+    All trees' nodes are concatenated into feature / threshold / children / missing_left / value
+    arrays (feature < 0 marks a leaf; children holds each node's left and right child side by side),
+    so one vectorized step advances every unfinished (row, tree) path by one level.
+    prediction = base + sum over trees of value[leaf], where value is already weighted
+    (1 / n_trees for forests, learning_rate for boosting).
+    """
+
+    def __init__(self, feature, threshold, children, missing_left, value, roots, max_depth, base=0.0,
+                 n_features_in=None, source_digest=None):
+        self.feature = np.ascontiguousarray(feature, dtype=np.int32)
+        self.threshold = np.ascontiguousarray(threshold, dtype=np.float64)
+        self.children = np.ascontiguousarray(children, dtype=np.int32).reshape(-1)
+        self.missing_left = np.ascontiguousarray(missing_left, dtype=bool)
+        self.value = np.ascontiguousarray(value, dtype=np.float64)
+        self.roots = np.ascontiguousarray(roots, dtype=np.int32)
+        self.max_depth = int(max_depth)
+        self.base = float(base)
+        self.n_features_in = n_features_in
+        self.source_digest = source_digest
+        # Largest batch this is faster than model.predict for (see calibrate); None: no limit.
+        self.max_batch_rows = None
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @classmethod
+    def from_model(cls, model, source_digest=None):
+        if isinstance(model, (RandomForestRegressor, ExtraTreesRegressor)):
+            trees, weight, base = model.estimators_, 1.0 / len(model.estimators_), 0.0
+        elif isinstance(model, GradientBoostingRegressor):
+            if isinstance(model.init_, str) and model.init_ == 'zero':
+                base = 0.0
+            elif isinstance(model.init_, DummyRegressor):
+                base = float(np.ravel(model.init_.constant_)[0])
+            else:
+                # Any other init estimator contributes its own predict(X) to every prediction.
+                raise NotCompilableError(f'cannot compile a GradientBoostingRegressor with init={type(model.init_).__name__}')
+            trees, weight = model.estimators_[:, 0], model.learning_rate
+        elif isinstance(model, DecisionTreeRegressor):
+            trees, weight, base = [model], 1.0, 0.0
+        else:
+            raise NotCompilableError(f'cannot compile {type(model).__name__}')
+        if any(tree.tree_.n_outputs != 1 for tree in trees):
+            raise NotCompilableError('cannot compile multi-output trees')
+
+        feature, threshold, children, missing_left, value, roots = [], [], [], [], [], []
+        offset = 0
+        for tree in trees:
+            t = tree.tree_
+            is_leaf = t.children_left == -1
+            roots.append(offset)
+            feature.append(np.where(is_leaf, -1, t.feature))
+            threshold.append(np.where(is_leaf, 0.0, t.threshold))
+            children.append(np.where(is_leaf[:, None], 0, np.stack([t.children_left, t.children_right], axis=1) + offset))
+            missing_left.append(np.asarray(getattr(t, 'missing_go_to_left', np.zeros(t.node_count)), dtype=bool))
+            value.append(t.value[:, 0, 0] * weight)
+            offset += t.node_count
+
+        return cls(np.concatenate(feature), np.concatenate(threshold), np.concatenate(children),
+                   np.concatenate(missing_left), np.concatenate(value), roots,
+                   max(tree.tree_.max_depth for tree in trees), base, model.n_features_in_, source_digest)
+
+    def _leaves(self, X):
+        """Leaf index of every (row, tree) pair, shape (n_rows, n_trees)."""
+        n_rows, n_features = X.shape
+        x_flat = X.ravel()
+        has_nan = bool(np.isnan(x_flat).any())
+
+        nodes = np.tile(self.roots, n_rows)
+        row_start = np.repeat(np.arange(n_rows, dtype=np.int64) * n_features, self.n_trees)
+        active = np.flatnonzero(self.feature[nodes] >= 0)
+        current = nodes[active]
+        feature = self.feature[current]
+        for _ in range(self.max_depth):
+            if not active.size:
+                break
+            x = x_flat[row_start[active] + feature]
+            go_right = ~(x <= self.threshold[current])
+            if has_nan:
+                go_right &= ~(np.isnan(x) & self.missing_left[current])
+            current = self.children[2 * current + go_right]
+            feature = self.feature[current]
+            # Paths that reached a leaf are written back and dropped from the working set.
+            done = feature < 0
+            nodes[active[done]] = current[done]
+            active, current, feature = active[~done], current[~done], feature[~done]
+        return nodes.reshape(n_rows, self.n_trees)
+
+    def predict(self, X, chunk_size=4096):
+        if sparse.issparse(X):
+            X = X.toarray()
+        # sklearn trees compare float32 inputs against float64 thresholds.
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or (self.n_features_in is not None and X.shape[1] != self.n_features_in):
+            raise ValueError(f'expected {self.n_features_in} features, got shape {X.shape}')
+        predictions = np.empty(X.shape[0], dtype=np.float64)
+        for start in range(0, X.shape[0], chunk_size):
+            leaves = self._leaves(X[start:start + chunk_size])
+            predictions[start:start + chunk_size] = self.base + self.value[leaves].sum(axis=1)
+        return predictions
+
+
+def verify_parity(model, compiled, X, rtol=1e-9, atol=1e-9):
+    expected = model.predict(X)
+    actual = compiled.predict(X)
+    max_error = float(np.max(np.abs(expected - actual), initial=0.0))
+    if not np.allclose(expected, actual, rtol=rtol, atol=atol):
+        raise ValueError(f'Compiled model parity check failed (max abs error {max_error:.3e})')
+    return max_error
+
+
+def _best_time(predict, X, repeats=5):
+    predict(X)
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        predict(X)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def calibrate(model, compiled, X, batch_sizes=(1, 8, 32, 128, 512, 2048)):
+    """
+    Sets compiled.max_batch_rows to the largest batch size, of those that fit in X, up to which the
+    compiled predictor beats model.predict. Per-row numpy work outgrows sklearn's own loop on
+    large batches.
+    """
+    compiled.max_batch_rows = 0
+    for batch_size in batch_sizes:
+        if batch_size > X.shape[0]:
+            break
+        batch = X[:batch_size]
+        model_seconds, compiled_seconds = _best_time(model.predict, batch), _best_time(compiled.predict, batch)
+        logging.info(f'{batch_size} rows: model.predict {model_seconds * 1000:.3f} ms, compiled {compiled_seconds * 1000:.3f} ms')
+        if compiled_seconds >= model_seconds:
+            break
+        compiled.max_batch_rows = batch_size
+    else:
+        compiled.max_batch_rows = None
+    return compiled.max_batch_rows
+
+
+def export_compiled_model(model_path, compiled_path, model, X, n_check_rows=1000):
+    """Compiles the model saved at model_path if it is a supported tree ensemble; returns None otherwise."""
+    try:
+        try:
+            compiled = CompiledTreeEnsemble.from_model(model, source_digest=file_digest(model_path))
+        except NotCompilableError as e:
+            logging.info(f'Model not compiled ({e}), serving with model.predict')
+            if os.path.exists(compiled_path):
+                os.remove(compiled_path)
+            return None
+
+        # Serving feeds the compiled preprocessor's dense rows, so parity and timings use dense rows too.
+        X = X[:max(n_check_rows, 2048)]
+        X = X.toarray() if sparse.issparse(X) else np.asarray(X)
+        max_error = verify_parity(model, compiled, X[:n_check_rows])
+        logging.info(f'Compiled model parity check passed ({compiled.n_trees} trees, max abs error {max_error:.3e})')
+        max_batch_rows = calibrate(model, compiled, X)
+        if max_batch_rows == 0:
+            logging.info('Compiled model is not faster than model.predict, serving with model.predict')
+            if os.path.exists(compiled_path):
+                os.remove(compiled_path)
+            return None
+        logging.info(f'Compiled model used for batches of up to {max_batch_rows or "any number of"} rows')
+
+        save_object(file_path=compiled_path, obj=compiled)
+        logging.info(f'Compiled model saved to {compiled_path}')
+        return compiled
+    except Exception as e:
+        logging.info('Exception occured while exporting the compiled model')
+        raise customexception(e, sys)
@@ -0,0 +1,272 @@
+import sys
+import numpy as np
+import pandas as pd
+from src.Airbnb.logger import logging
+from src.Airbnb.exception import customexception
+from src.Airbnb.utils.utils import save_object, load_object, file_digest
+
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import FunctionTransformer, OrdinalEncoder, StandardScaler
+from src.Airbnb.components.Amenity_featurizer import AmenityFeaturizer, amenity_tokens, _token_codes
+
+UNKNOWN_CATEGORY = '__unknown__'
+
+# Below this many rows per-value dict lookups beat building pandas indexes; above it columns are encoded vectorized.
+VECTORIZE_MIN_ROWS = 128
+
+
+def _is_missing(value):
+    return value is None or value != value
+
+
+class CompiledPreprocessor:
+    """
+    Flat-array version of the fitted ColumnTransformer.
+    Scalar input column j fills output column positions[j] with
+    (encode(impute(row[input_columns[j]])) - offset) / scale, where encode is a dict lookup for
+    ordinal-encoded columns and float() otherwise. Each multi-hot block (AmenityFeaturizer) fills
+    its own output columns from the row's amenity tokens.
+    """
+
+    def __init__(self, input_columns, fill_values, lookups, unknown_values, offset, scale, source_digest=None,
+                 positions=None, multi_hot=None):
+        self.input_columns = list(input_columns)
+        self.fill_values = list(fill_values)
+        self.lookups = list(lookups)
+        self.unknown_values = list(unknown_values)
+        self.offset = np.asarray(offset, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.source_digest = source_digest
+        self.positions = list(range(len(self.input_columns))) if positions is None else list(positions)
+        self.multi_hot = list(multi_hot or [])
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('_category_indexes', None)
+        return state
+
+    def __setstate__(self, state):
+        # Compiled preprocessors saved before multi-hot support.
+        state.setdefault('positions', list(range(len(state['input_columns']))))
+        state.setdefault('multi_hot', [])
+        self.__dict__.update(state)
+
+    @property
+    def n_features_out(self):
+        return len(self.offset)
+
+    @classmethod
+    def from_column_transformer(cls, preprocessor, source_digest=None):
+        input_columns, fill_values, lookups, unknown_values, offset, scale = [], [], [], [], [], []
+        positions, multi_hot = [], []
+
+        for name, transformer, columns in preprocessor.transformers_:
+            if transformer == 'drop' or len(columns) == 0:
+                continue
+            if isinstance(transformer, Pipeline) and len(transformer.steps) == 1:
+                transformer = transformer.steps[0][1]
+            if isinstance(transformer, AmenityFeaturizer):
+                column = columns if isinstance(columns, str) else columns[0]
+                multi_hot.append({
+                    'column': column,
+                    'start': len(offset),
+                    'vocabulary': {token: j for j, token in enumerate(transformer.vocabulary_)},
+                    'frequencies': np.asarray(transformer.frequencies_, dtype=np.float64)
+                })
+                offset.extend([0.0] * len(transformer.vocabulary_))
+                scale.extend([1.0] * len(transformer.vocabulary_))
+                continue
+            steps = [] if transformer == 'passthrough' else (
+                [step for _, step in transformer.steps] if isinstance(transformer, Pipeline) else [transformer]
+            )
+
+            fills = [None] * len(columns)
+            codes = [None] * len(columns)
+            unknowns = [None] * len(columns)
+            offsets = np.zeros(len(columns))
+            scales = np.ones(len(columns))
+            encoded = scaled = False
+
+            for step in steps:
+                # Fitted ColumnTransformers hold 'passthrough' as an identity FunctionTransformer.
+                if step == 'passthrough' or (isinstance(step, FunctionTransformer) and step.func is None):
+                    continue
+                if isinstance(step, SimpleImputer):
+                    if step.add_indicator or not _is_missing(step.missing_values):
+                        raise NotImplementedError(f'cannot compile SimpleImputer settings in {name}')
+                    if encoded or scaled:
+                        raise NotImplementedError(f'SimpleImputer must come first in {name}')
+                    fills = list(step.statistics_)
+                elif isinstance(step, OrdinalEncoder):
+                    if encoded or scaled:
+                        raise NotImplementedError(f'OrdinalEncoder must come before scaling in {name}')
+                    codes = [{category: float(code) for code, category in enumerate(categories)}
+                             for categories in step.categories_]
+                    unknown = float(step.unknown_value) if step.handle_unknown == 'use_encoded_value' else None
+                    unknowns = [unknown] * len(columns)
+                    encoded = True
+                elif isinstance(step, StandardScaler):
+                    mean = step.mean_ if step.with_mean else np.zeros(len(columns))
+                    std = step.scale_ if step.with_std else np.ones(len(columns))
+                    offsets = offsets + mean * scales
+                    scales = scales * std
+                    scaled = True
+                else:
+                    raise NotImplementedError(f'cannot compile {type(step).__name__} in {name}')
+
+            positions.extend(range(len(offset), len(offset) + len(columns)))
+            input_columns.extend(columns)
+            fill_values.extend(fills)
+            lookups.extend(codes)
+            unknown_values.extend(unknowns)
+            offset.extend(offsets)
+            scale.extend(scales)
+
+        return cls(input_columns, fill_values, lookups, unknown_values, offset, scale, source_digest,
+                   positions=positions, multi_hot=multi_hot)
+
+    def _category_index(self, j):
+        indexes = self.__dict__.setdefault('_category_indexes', {})
+        if j not in indexes:
+            lookup = self.lookups[j]
+            indexes[j] = (pd.Index(list(lookup), dtype=object), np.array(list(lookup.values()), dtype=np.float64))
+        return indexes[j]
+
+    def _encode_column(self, j, values):
+        fill = self.fill_values[j]
+        lookup = self.lookups[j]
+        if lookup is None:
+            column = np.array(values, dtype=np.float64)
+            if fill is not None:
+                column[np.isnan(column)] = fill
+            return column
+
+        unknown = self.unknown_values[j]
+        if len(values) >= VECTORIZE_MIN_ROWS:
+            values = np.array(values, dtype=object)
+            if fill is not None:
+                values[pd.isna(values)] = fill
+            index, codes = self._category_index(j)
+            positions = index.get_indexer(values)
+            unseen = positions < 0
+            if unseen.any() and unknown is None:
+                raise ValueError(f'unknown category {values[unseen][0]!r} for {self.input_columns[j]}')
+            return np.where(unseen, unknown if unknown is not None else 0.0, codes[positions])
+
+        encoded = []
+        for value in values:
+            if _is_missing(value) and fill is not None:
+                value = fill
+            code = lookup.get(value, unknown)
+            if code is None:
+                raise ValueError(f'unknown category {value!r} for {self.input_columns[j]}')
+            encoded.append(code)
+        return np.array(encoded, dtype=np.float64)
+
+    @staticmethod
+    def _encode_multi_hot(block, values, out):
+        vocabulary = block['vocabulary']
+        if len(values) >= VECTORIZE_MIN_ROWS:
+            # Same single tokenizing pass as AmenityFeaturizer.transform, scattered into the dense block.
+            rows, codes, uniques, _, missing = _token_codes(values)
+            remap = np.array([vocabulary.get(token, -1) for token in uniques], dtype=np.int64)
+            columns = remap[codes] if len(codes) else codes
+            known = columns >= 0
+            out[rows[known], columns[known]] = 1.0
+            out[missing] = block['frequencies']
+            return
+
+        for i, value in enumerate(values):
+            tokens = amenity_tokens(value)
+            if tokens is None:
+                out[i] = block['frequencies']
+            else:
+                for token in tokens:
+                    j = vocabulary.get(token)
+                    if j is not None:
+                        out[i, j] = 1.0
+
+    def _transform_columns(self, get_column, n_rows):
+        raw = np.zeros((n_rows, self.n_features_out), dtype=np.float64)
+        for j, column in enumerate(self.input_columns):
+            raw[:, self.positions[j]] = self._encode_column(j, get_column(column))
+        for block in self.multi_hot:
+            stop = block['start'] + len(block['vocabulary'])
+            self._encode_multi_hot(block, get_column(block['column']), raw[:, block['start']:stop])
+        return (raw - self.offset) / self.scale
+
+    def transform_records(self, records):
+        return self._transform_columns(lambda column: [record.get(column) for record in records], len(records))
+
+    def transform(self, df):
+        return self._transform_columns(lambda column: df[column].tolist(), len(df))
+
+
+def make_parity_frame(compiled, n_rows=512, random_state=42):
+    rng = np.random.default_rng(random_state)
+    data = {}
+    for j, column in enumerate(compiled.input_columns):
+        if column in data:
+            continue
+        if compiled.lookups[j] is not None:
+            choices = list(compiled.lookups[j]) + [np.nan]
+            if compiled.unknown_values[j] is not None:
+                choices.append(UNKNOWN_CATEGORY)
+            values = [choices[i % len(choices)] for i in range(n_rows)]
+            rng.shuffle(values)
+        else:
+            center = compiled.offset[j] if compiled.fill_values[j] is None else compiled.fill_values[j]
+            values = center + compiled.scale[j] * rng.standard_normal(n_rows)
+            values[rng.random(n_rows) < 0.1] = np.nan
+        data[column] = values
+    for block in compiled.multi_hot:
+        tokens = list(block['vocabulary']) + [UNKNOWN_CATEGORY]
+        values = []
+        for i in range(n_rows):
+            picks = [tokens[k] for k in rng.choice(len(tokens), rng.integers(0, min(8, len(tokens)) + 1), replace=False)]
+            if i % 10 == 0:
+                values.append(np.nan if i % 20 else '')
+            elif i % 10 == 9:
+                values.append('{}' if i % 20 == 9 else ())
+            elif i % 10 == 1:
+                values.append(tuple(picks))
+            else:
+                values.append('{' + ','.join(f'"{token.upper() if i % 3 else token}"' for token in picks) + '}')
+        data[block['column']] = values
+    return pd.DataFrame(data)
+
+
+def verify_parity(preprocessor, compiled, df, atol=1e-9):
+    expected = preprocessor.transform(df)
+    if hasattr(expected, 'toarray'):
+        expected = expected.toarray()
+    actual = compiled.transform(df)
+    if expected.shape != actual.shape:
+        raise ValueError(f'Compiled preprocessor shape {actual.shape} does not match {expected.shape}')
+    max_error = float(np.nanmax(np.abs(expected - actual), initial=0.0))
+    if not np.allclose(expected, actual, rtol=0, atol=atol, equal_nan=True):
+        raise ValueError(f'Compiled preprocessor parity check failed (max abs error {max_error:.3e})')
+    return max_error
+
+
+def export_compiled_preprocessor(preprocessor_path, compiled_path, preprocessor=None):
+    try:
+        if preprocessor is None:
+            preprocessor = load_object(preprocessor_path)
+
+        compiled = CompiledPreprocessor.from_column_transformer(
+            preprocessor, source_digest=file_digest(preprocessor_path)
+        )
+        # The small slice goes through the per-value encoders, the full frame through the vectorized ones.
+        frame = make_parity_frame(compiled)
+        max_error = max(verify_parity(preprocessor, compiled, frame.iloc[:VECTORIZE_MIN_ROWS // 2]),
+                        verify_parity(preprocessor, compiled, frame))
+        logging.info(f'Compiled preprocessor parity check passed (max abs error {max_error:.3e})')
+
+        save_object(file_path=compiled_path, obj=compiled)
+        logging.info(f'Compiled preprocessor saved to {compiled_path}')
+        return compiled
+    except Exception as e:
+        logging.info('Exception occured while exporting the compiled preprocessor')
+        raise customexception(e, sys)
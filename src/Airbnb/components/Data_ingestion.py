@@ -1,52 +1,78 @@
 import os
 import sys
+import time
 import numpy as np
 import pandas as pd
 from src.Airbnb.logger import logging
 from src.Airbnb.exception import customexception
+from src.Airbnb.utils.stage_cache import StageCache
+from src.Airbnb.utils import columnar
+from src.Airbnb.utils.columnar import ColumnarStore, write_columnar
 from sklearn.model_selection import train_test_split
 from dataclasses import dataclass
 from pathlib import Path
 
 @dataclass
 class DataIngestionConfig:
-    raw_data_path:str = os.path.join("Artifacts","raw_data.csv")
-    train_data_path:str = os.path.join("Artifacts","train_data.csv")
-    val_data_path:str = os.path.join("Artifacts","val_data.csv")
-    test_data_path:str = os.path.join("Artifacts","test_data.csv")
+    source_data_path:str = os.path.join("Artifacts","New_Airbnb_Data.csv")
+    raw_data_path:str = os.path.join("Artifacts","raw_data")
+    split_index_path:str = os.path.join("Artifacts","split_indices.npz")
+    test_size:float = 0.2
+    val_size:float = 0.25
+    random_state:int = 42
+    # Text columns with fewer distinct values than this fraction of rows are stored as categoricals.
+    categorical_ratio:float = 0.5
 
 class DataIngestion:
     def __init__(self):
         self.ingestion_config = DataIngestionConfig()
+        self.stage_cache = StageCache()
 
     def initiate_data_ingestion(self):
         logging.info("Data ingestion started")
         try:
-            data = pd.read_csv(os.path.join("Artifacts", "New_Airbnb_Data.csv"))
+            config = self.ingestion_config
+            fingerprint = self.stage_cache.fingerprint(
+                inputs=[config.source_data_path],
+                config={'test_size': config.test_size, 'val_size': config.val_size,
+                        'random_state': config.random_state, 'categorical_ratio': config.categorical_ratio},
+                modules=[sys.modules[__name__], columnar]
+            )
+            if self.stage_cache.is_fresh('data_ingestion', fingerprint):
+                logging.info("Source data and split config unchanged, skipping data ingestion")
+                return (config.raw_data_path, config.split_index_path)
+            start = time.perf_counter()
+
+            data = pd.read_csv(config.source_data_path)
             logging.info("Read the Data from the csv file")
 
-            os.makedirs(os.path.dirname(os.path.join(self.ingestion_config.raw_data_path)), exist_ok=True)
-            data.to_csv(self.ingestion_config.raw_data_path, index=False)
-            logging.info("Created the raw data file")
+            columns = {}
+            for name in data.columns:
+                column = data[name]
+                if column.dtype == object and column.nunique() < config.categorical_ratio * len(column):
+                    column = pd.Categorical(column)
+                columns[name] = column
+            write_columnar(config.raw_data_path, columns, meta={'source': config.source_data_path})
+            logging.info("Created the columnar raw data copy")
 
             logging.info("Splitting the data into train, val and test")
-            train_val_data, test_data = train_test_split(data, test_size=0.2, random_state=42)
+            # Same permutations as splitting the DataFrame itself, stored as row indices into the raw copy.
+            train_val_idx, test_idx = train_test_split(np.arange(len(data)), test_size=config.test_size, random_state=config.random_state)
             
-            train_data, val_data = train_test_split(train_val_data, test_size=0.25, random_state=42)
+            train_idx, val_idx = train_test_split(train_val_idx, test_size=config.val_size, random_state=config.random_state)
             
             logging.info("Data Splitting is done. Sizes: Train(60%), Val(20%), Test(20%)")
 
-            train_data.to_csv(self.ingestion_config.train_data_path, index=False)
-            val_data.to_csv(self.ingestion_config.val_data_path, index=False)
-            test_data.to_csv(self.ingestion_config.test_data_path, index=False)
+            np.savez(config.split_index_path, train=train_idx, val=val_idx, test=test_idx)
             
-            logging.info("Created the train, val and test data files")
+            logging.info("Created the train, val and test index arrays")
             logging.info("Data ingestion completed")
+            outputs = ColumnarStore(config.raw_data_path).files() + [config.split_index_path]
+            self.stage_cache.record('data_ingestion', fingerprint, outputs, time.perf_counter() - start)
 
             return (
-                self.ingestion_config.train_data_path,
-                self.ingestion_config.val_data_path,
-                self.ingestion_config.test_data_path
+                config.raw_data_path,
+                config.split_index_path
             )
         except Exception as e:
             logging.info("Excpetion occured while ingesting the data")
@@ -1,5 +1,6 @@
 import os
 import sys
+import time
 import pandas as pd
 import numpy as np
 
@@ -12,39 +13,74 @@ from sklearn.impute import SimpleImputer
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import OrdinalEncoder,StandardScaler
 
-from src.Airbnb.utils.utils import save_object
+from src.Airbnb.utils import utils
+from src.Airbnb.utils.utils import save_object, save_matrix, load_matrix
+from src.Airbnb.components import Compiled_preprocessor
+from src.Airbnb.components.Compiled_preprocessor import export_compiled_preprocessor
+from src.Airbnb.components import Amenity_featurizer
+from src.Airbnb.components.Amenity_featurizer import AmenityFeaturizer
+from scipy import sparse
+from src.Airbnb.utils.stage_cache import StageCache
+from src.Airbnb.utils import columnar
+from src.Airbnb.utils.columnar import ColumnarStore
 
 @dataclass
 class DataTransformationConfig:
     preprocessor_obj_file_path=os.path.join('Artifacts','Preprocessor.pkl')
+    compiled_preprocessor_file_path=os.path.join('Artifacts','Compiled_Preprocessor.pkl')
+    # Saved as .npy, or .npz when the transformed data is sparse (see save_matrix).
+    train_arr_file_path=os.path.join('Artifacts','train_arr')
+    val_arr_file_path=os.path.join('Artifacts','val_arr')
+    test_arr_file_path=os.path.join('Artifacts','test_arr')
+    numerical_cols=['amenities','accommodates','bathrooms','latitude','longitude','host_response_rate','number_of_reviews','review_scores_rating','bedrooms','beds']
+    categorical_cols=['property_type','room_type','bed_type','cancellation_policy','cleaning_fee','city','host_identity_verified','instant_bookable','host_has_profile_pic']
+    target_column_name='log_price'
+    drop_columns=['log_price','id',"name","description","first_review","host_since","last_review","neighbourhood","thumbnail_url", "zipcode"]
+    target_cap_quantile=0.99
+    # Raw amenity list, featurized as a top-K multi-hot next to the numeric amenity count.
+    amenity_list_col='amenity_list'
+    amenity_top_k=50
+    # ColumnTransformer output is kept sparse (CSR) whenever a transformer returns sparse output.
+    sparse_threshold=1.0
+    # Lean path for the histogram boosting models: no scaling, categoricals as ordinal codes
+    # (NaN for unseen categories) that the models split on natively, dense output.
+    native_preprocessor_obj_file_path=os.path.join('Artifacts','Native_Preprocessor.pkl')
+    compiled_native_preprocessor_file_path=os.path.join('Artifacts','Compiled_Native_Preprocessor.pkl')
+    train_native_arr_file_path=os.path.join('Artifacts','train_native_arr')
+    val_native_arr_file_path=os.path.join('Artifacts','val_native_arr')
+    test_native_arr_file_path=os.path.join('Artifacts','test_native_arr')
 
 
 class DataTransformation:
     def __init__(self):
         self.data_transformation_config=DataTransformationConfig()
+        self.stage_cache=StageCache()
 
     
+    def get_categories(self):
+        property_type_cat = sorted(list(set(['Apartment', 'House', 'Condominium', 'Townhouse', 'Loft', 'Other', 'Guesthouse', 'Bed & Breakfast', 'Bungalow', 'Villa', 'Dorm', 'Guest suite', 'Camper/RV', 'Timeshare', 'Cabin', 'In-law', 'Hostel', 'Boutique hotel', 'Boat', 'Serviced apartment', 'Tent', 'Castle', 'Vacation home', 'Yurt', 'Hut', 'Treehouse', 'Chalet', 'Earth House', 'Tipi', 'Train', 'Cave', 'Casa particular', 'Parking Space', 'Lighthouse', 'Island', 'Entire condo', 'Entire home', 'Entire rental unit', 'Entire guest suite', 'Entire vacation home', 'Private room in condo', 'Private room in rental unit', 'Private room in home', 'Room in hotel', 'Room in boutique hotel', 'Room in aparthotel', 'Entire townhouse', 'Entire loft', 'Private room in townhouse', 'Private room in loft', 'Shared room in rental unit', 'Shared room in home', 'Shared room in condo', 'Tiny home', 'Entire cottage', 'Private room in cottage', 'Entire guesthouse', 'Private room in guest suite', 'Private room in guesthouse', 'Entire bungalow', 'Private room in bungalow', 'Entire villa', 'Private room in villa', 'Entire place', 'Private room', 'Shared room', 'Hotel room', 'Entire serviced apartment', 'Private room in serviced apartment', 'Shared room in hostel', 'Private room in hostel', 'Room in bed and breakfast', 'Barn', 'Bus', 'Campsite', 'Dome', 'Dome house', 'Farm stay', 'Houseboat', 'Kezhan', 'Minsu', 'Religious building', 'Riad', 'Shepherd\'s hut', 'Shipping container', 'Tower', 'Trullo', 'Windmill'])))
+        
+        room_type_cat = sorted(list(set(['Entire home/apt', 'Private room', 'Shared room', 'Hotel room', 'Entire home', 'Entire condo', 'Entire guest suite', 'Private room in rental unit', 'Private room in home', 'Entire rental unit'])))
+        
+        bed_type_cat = ['Real Bed', 'Futon', 'Pull-out Sofa', 'Airbed', 'Couch']
+        cancellation_policy_cat = ['strict', 'moderate', 'flexible', 'super_strict_30', 'super_strict_60']
+        cleaning_fee_cat = ['True', 'False', '0', '1']
+        
+        city_cat = ['NYC', 'SF', 'DC', 'LA', 'Chicago', 'Boston']
+        host_has_profile_pic_cat = ['t', 'f']
+        host_identity_verified_cat = ['t', 'f']
+        instant_bookable_cat = ['t', 'f', '0', '1']
+
+        return [property_type_cat, room_type_cat, bed_type_cat, cancellation_policy_cat, cleaning_fee_cat, city_cat, host_has_profile_pic_cat, host_identity_verified_cat, instant_bookable_cat]
+
     def get_data_transformation(self):
         
         try:
             logging.info('Data Transformation initiated')
 
 
-            numerical_cols   = ['amenities','accommodates','bathrooms','latitude','longitude','host_response_rate','number_of_reviews','review_scores_rating','bedrooms','beds']
-            categorical_cols = ['property_type','room_type','bed_type','cancellation_policy','cleaning_fee','city','host_identity_verified','instant_bookable','host_has_profile_pic']
-
-            property_type_cat = sorted(list(set(['Apartment', 'House', 'Condominium', 'Townhouse', 'Loft', 'Other', 'Guesthouse', 'Bed & Breakfast', 'Bungalow', 'Villa', 'Dorm', 'Guest suite', 'Camper/RV', 'Timeshare', 'Cabin', 'In-law', 'Hostel', 'Boutique hotel', 'Boat', 'Serviced apartment', 'Tent', 'Castle', 'Vacation home', 'Yurt', 'Hut', 'Treehouse', 'Chalet', 'Earth House', 'Tipi', 'Train', 'Cave', 'Casa particular', 'Parking Space', 'Lighthouse', 'Island', 'Entire condo', 'Entire home', 'Entire rental unit', 'Entire guest suite', 'Entire vacation home', 'Private room in condo', 'Private room in rental unit', 'Private room in home', 'Room in hotel', 'Room in boutique hotel', 'Room in aparthotel', 'Entire townhouse', 'Entire loft', 'Private room in townhouse', 'Private room in loft', 'Shared room in rental unit', 'Shared room in home', 'Shared room in condo', 'Tiny home', 'Entire cottage', 'Private room in cottage', 'Entire guesthouse', 'Private room in guest suite', 'Private room in guesthouse', 'Entire bungalow', 'Private room in bungalow', 'Entire villa', 'Private room in villa', 'Entire place', 'Private room', 'Shared room', 'Hotel room', 'Entire serviced apartment', 'Private room in serviced apartment', 'Shared room in hostel', 'Private room in hostel', 'Room in bed and breakfast', 'Barn', 'Bus', 'Campsite', 'Dome', 'Dome house', 'Farm stay', 'Houseboat', 'Kezhan', 'Minsu', 'Religious building', 'Riad', 'Shepherd\'s hut', 'Shipping container', 'Tower', 'Trullo', 'Windmill'])))
-            
-            room_type_cat = sorted(list(set(['Entire home/apt', 'Private room', 'Shared room', 'Hotel room', 'Entire home', 'Entire condo', 'Entire guest suite', 'Private room in rental unit', 'Private room in home', 'Entire rental unit'])))
-            
-            bed_type_cat = ['Real Bed', 'Futon', 'Pull-out Sofa', 'Airbed', 'Couch']
-            cancellation_policy_cat = ['strict', 'moderate', 'flexible', 'super_strict_30', 'super_strict_60']
-            cleaning_fee_cat = ['True', 'False', '0', '1']
-            
-            city_cat = ['NYC', 'SF', 'DC', 'LA', 'Chicago', 'Boston']
-            host_has_profile_pic_cat = ['t', 'f']
-            host_identity_verified_cat = ['t', 'f']
-            instant_bookable_cat = ['t', 'f', '0', '1']
+            numerical_cols   = self.data_transformation_config.numerical_cols
+            categorical_cols = self.data_transformation_config.categorical_cols
 
             logging.info('Pipeline Initiated')
             
@@ -56,26 +92,89 @@ class DataTransformation:
             cat_pipeline=Pipeline(
                 steps=[
                 ('imputer',SimpleImputer(strategy='most_frequent')),
-                ('ordinalencoder',OrdinalEncoder(categories=[property_type_cat, room_type_cat, bed_type_cat, cancellation_policy_cat, cleaning_fee_cat, city_cat, host_has_profile_pic_cat, host_identity_verified_cat, instant_bookable_cat], handle_unknown='use_encoded_value', unknown_value=-1)),
+                ('ordinalencoder',OrdinalEncoder(categories=self.get_categories(), handle_unknown='use_encoded_value', unknown_value=-1)),
                 ('scaler',StandardScaler())])
             
             preprocessor=ColumnTransformer([
             ('num_pipeline',num_pipeline,numerical_cols),
-            ('cat_pipeline',cat_pipeline,categorical_cols)
-            ])
+            ('cat_pipeline',cat_pipeline,categorical_cols),
+            ('amenity_pipeline',AmenityFeaturizer(top_k=self.data_transformation_config.amenity_top_k),[self.data_transformation_config.amenity_list_col])
+            ], sparse_threshold=self.data_transformation_config.sparse_threshold)
             
             return preprocessor
         
         except Exception as e:
             logging.info("Exception occured in the initiate_datatransformation")
             raise customexception(e,sys)
+
+    def get_native_data_transformation(self):
+        try:
+            config = self.data_transformation_config
+
+            # Numeric NaNs are left for the trees' own missing-value handling.
+            cat_pipeline=Pipeline(
+                steps=[
+                ('imputer',SimpleImputer(strategy='most_frequent')),
+                ('ordinalencoder',OrdinalEncoder(categories=self.get_categories(), handle_unknown='use_encoded_value', unknown_value=np.nan))])
+
+            return ColumnTransformer([
+            ('num_pipeline','passthrough',config.numerical_cols),
+            ('cat_pipeline',cat_pipeline,config.categorical_cols),
+            ('amenity_pipeline',AmenityFeaturizer(top_k=config.amenity_top_k),[config.amenity_list_col])
+            ], sparse_threshold=0)
+
+        except Exception as e:
+            logging.info("Exception occured in the get_native_data_transformation")
+            raise customexception(e,sys)
+
+    def native_categorical_features(self):
+        """Column positions of the categorical features in the native arrays."""
+        config = self.data_transformation_config
+        start = len(config.numerical_cols)
+        return list(range(start, start + len(config.categorical_cols)))
+
+    def load_native_arrays(self):
+        config = self.data_transformation_config
+        return (
+            load_matrix(config.train_native_arr_file_path, mmap_mode='r'),
+            load_matrix(config.val_native_arr_file_path, mmap_mode='r'),
+            load_matrix(config.test_native_arr_file_path, mmap_mode='r')
+        )
             
     
-    def initialize_data_transformation(self,train_path,val_path,test_path):
+    def initialize_data_transformation(self,raw_data_path,split_index_path):
         try:
-            train_df=pd.read_csv(train_path)
-            val_df=pd.read_csv(val_path)
-            test_df=pd.read_csv(test_path)
+            config = self.data_transformation_config
+            fingerprint = self.stage_cache.fingerprint(
+                inputs=ColumnarStore(raw_data_path).files() + [split_index_path],
+                config={
+                    'numerical_cols': config.numerical_cols,
+                    'categorical_cols': config.categorical_cols,
+                    'target_column_name': config.target_column_name,
+                    'drop_columns': config.drop_columns,
+                    'target_cap_quantile': config.target_cap_quantile,
+                    'amenity_list_col': config.amenity_list_col,
+                    'amenity_top_k': config.amenity_top_k,
+                    'sparse_threshold': config.sparse_threshold
+                },
+                modules=[sys.modules[__name__], utils, columnar, Compiled_preprocessor, Amenity_featurizer]
+            )
+            if self.stage_cache.is_fresh('data_transformation', fingerprint):
+                logging.info("Train/val/test data and transformation unchanged, reusing stored arrays")
+                return (
+                    load_matrix(config.train_arr_file_path, mmap_mode='r'),
+                    load_matrix(config.val_arr_file_path, mmap_mode='r'),
+                    load_matrix(config.test_arr_file_path, mmap_mode='r')
+                )
+            start = time.perf_counter()
+
+            # Only the feature and target columns of each split are read from the memory-mapped raw copy.
+            raw_store = ColumnarStore(raw_data_path)
+            needed_cols = config.numerical_cols + config.categorical_cols + [config.target_column_name]
+            with np.load(split_index_path) as split_indices:
+                train_df = raw_store.to_frame(needed_cols, split_indices['train'])
+                val_df = raw_store.to_frame(needed_cols, split_indices['val'])
+                test_df = raw_store.to_frame(needed_cols, split_indices['test'])
             
             logging.info("read train, val and test data complete")
             logging.info(f'Train Dataframe Head : \n{train_df.head().to_string()}')
@@ -101,15 +200,16 @@ class DataTransformation:
 
                 df['cleaning_fee'] = df['cleaning_fee'].astype(str)
                 
-                df['amenities'] = [len(str(amenity).split(',')) for amenity in df['amenities']]
+                df[config.amenity_list_col] = df['amenities']
+                df['amenities'] = df['amenities'].astype(str).str.count(',') + 1
 
 
             logging.info("Host Response Rate converted and amenities fixed")
 
-            target_column_name = 'log_price'
-            drop_columns = [target_column_name,'id',"name","description","first_review","host_since","last_review","neighbourhood","thumbnail_url", "zipcode"]
+            target_column_name = config.target_column_name
+            drop_columns = config.drop_columns
             
-            price_99_percentile = train_df['log_price'].quantile(0.99)
+            price_99_percentile = train_df['log_price'].quantile(config.target_cap_quantile)
             logging.info(f"Capping log_price at 99th percentile: {price_99_percentile:.4f}")
             
             train_df = train_df[train_df['log_price'] <= price_99_percentile]
@@ -134,12 +234,22 @@ class DataTransformation:
             input_feature_val_arr = preprocessing_obj.transform(input_feature_val_df)
             input_feature_test_arr = preprocessing_obj.transform(input_feature_test_df)
 
+            native_preprocessing_obj = self.get_native_data_transformation()
+            native_train_arr = native_preprocessing_obj.fit_transform(input_feature_train_df)
+            native_val_arr = native_preprocessing_obj.transform(input_feature_val_df)
+            native_test_arr = native_preprocessing_obj.transform(input_feature_test_df)
             
             logging.info("Applying preprocessing object on training, validation and testing datasets.")
 
-            train_arr = np.concatenate([input_feature_train_arr, np.array(target_feature_train_df).reshape(-1, 1)], axis=1)
-            val_arr = np.concatenate([input_feature_val_arr, np.array(target_feature_val_df).reshape(-1, 1)], axis=1)
-            test_arr = np.concatenate([input_feature_test_arr, np.array(target_feature_test_df).reshape(-1, 1)], axis=1)
+            def with_target(features, target):
+                target = np.array(target, dtype=np.float64).reshape(-1, 1)
+                if sparse.issparse(features):
+                    return sparse.hstack([features, target], format='csr')
+                return np.concatenate([features, target], axis=1)
+
+            train_arr = with_target(input_feature_train_arr, target_feature_train_df)
+            val_arr = with_target(input_feature_val_arr, target_feature_val_df)
+            test_arr = with_target(input_feature_test_arr, target_feature_test_df)
 
 
             save_object(
@@ -148,6 +258,30 @@ class DataTransformation:
             )
             
             logging.info("preprocessing pickle file saved")
+
+            export_compiled_preprocessor(
+                preprocessor_path=self.data_transformation_config.preprocessor_obj_file_path,
+                compiled_path=self.data_transformation_config.compiled_preprocessor_file_path,
+                preprocessor=preprocessing_obj
+            )
+
+            save_object(file_path=config.native_preprocessor_obj_file_path, obj=native_preprocessing_obj)
+            export_compiled_preprocessor(
+                preprocessor_path=config.native_preprocessor_obj_file_path,
+                compiled_path=config.compiled_native_preprocessor_file_path,
+                preprocessor=native_preprocessing_obj
+            )
+            logging.info("native preprocessing pickle file saved")
+
+            outputs = [config.preprocessor_obj_file_path, config.compiled_preprocessor_file_path,
+                       save_matrix(config.train_arr_file_path, train_arr),
+                       save_matrix(config.val_arr_file_path, val_arr),
+                       save_matrix(config.test_arr_file_path, test_arr),
+                       config.native_preprocessor_obj_file_path, config.compiled_native_preprocessor_file_path,
+                       save_matrix(config.train_native_arr_file_path, with_target(native_train_arr, target_feature_train_df)),
+                       save_matrix(config.val_native_arr_file_path, with_target(native_val_arr, target_feature_val_df)),
+                       save_matrix(config.test_native_arr_file_path, with_target(native_test_arr, target_feature_test_df))]
+            self.stage_cache.record('data_transformation', fingerprint, outputs, time.perf_counter() - start)
             
             return (
                 train_arr,
@@ -0,0 +1,89 @@
+import io
+import sys
+import json
+import time
+import joblib
+import numpy as np
+from scipy import sparse
+from src.Airbnb.logger import logging
+from src.Airbnb.exception import customexception
+
+
+def _latencies_ms(predict, X, n_calls):
+    timings = np.empty(n_calls)
+    for i in range(n_calls):
+        inputs = X(i)
+        start = time.perf_counter()
+        predict(inputs)
+        timings[i] = time.perf_counter() - start
+    return {'p50_ms': float(np.percentile(timings, 50) * 1000), 'p99_ms': float(np.percentile(timings, 99) * 1000)}
+
+
+def measure_model(model, X, n_row_calls=200, batch_size=256, n_batch_calls=20):
+    """
+    Serialized size and p50/p99 model.predict latency for single rows and batches of X (model only,
+    no preprocessing). Rows are timed dense, as the compiled preprocessor serves them to every model,
+    even when X is the sparse training matrix.
+    """
+    buffer = io.BytesIO()
+    joblib.dump(model, buffer)
+
+    X = X[:max(n_row_calls, batch_size)]
+    X = np.asarray(X.toarray() if sparse.issparse(X) else X, dtype=np.float64)
+    n_rows = X.shape[0]
+    batch = X[:batch_size]
+    model.predict(X[:1])
+    model.predict(batch)
+    return {
+        'size_bytes': buffer.tell(),
+        'row': _latencies_ms(model.predict, lambda i: X[i % n_rows:i % n_rows + 1], n_row_calls),
+        'batch': dict(_latencies_ms(model.predict, lambda i: batch, n_batch_calls), size=int(batch.shape[0]))
+    }
+
+
+def slo_violations(measurement, policy):
+    violations = []
+    if policy.get('max_model_mb') is not None and measurement['size_bytes'] > policy['max_model_mb'] * 1024 * 1024:
+        violations.append(f"size {measurement['size_bytes'] / 1024 / 1024:.1f} MB > {policy['max_model_mb']} MB")
+    if policy.get('max_row_p99_ms') is not None and measurement['row']['p99_ms'] > policy['max_row_p99_ms']:
+        violations.append(f"row p99 {measurement['row']['p99_ms']:.2f} ms > {policy['max_row_p99_ms']} ms")
+    if policy.get('max_batch_p99_ms') is not None and measurement['batch']['p99_ms'] > policy['max_batch_p99_ms']:
+        violations.append(f"batch p99 {measurement['batch']['p99_ms']:.2f} ms > {policy['max_batch_p99_ms']} ms")
+    return violations
+
+
+def select_model(model_report, measurements, policy):
+    """
+    Keeps the candidates that meet the SLOs in `policy` (all of them if none do), then picks the
+    cheapest one (row p99 latency, then size) whose CV score is within score_tolerance of the best.
+    Returns the chosen name and a JSON-ready record of the policy and every measurement.
+    """
+    candidates = {
+        name: dict(measurements[name], cv_score=float(score), violations=slo_violations(measurements[name], policy))
+        for name, score in model_report.items()
+    }
+    eligible = [name for name, candidate in candidates.items() if not candidate['violations']]
+    if not eligible:
+        logging.info('No candidate meets the selection SLOs, choosing among all candidates')
+    pool = eligible or list(candidates)
+
+    best_score = max(candidates[name]['cv_score'] for name in pool)
+    near_best = [name for name in pool if candidates[name]['cv_score'] >= best_score - policy.get('score_tolerance', 0.0)]
+    chosen = min(near_best, key=lambda name: (candidates[name]['row']['p99_ms'], candidates[name]['size_bytes']))
+
+    return chosen, {
+        'chosen': chosen,
+        'policy': policy,
+        'slo_met': bool(eligible),
+        'best_score': best_score,
+        'near_best': near_best,
+        'candidates': candidates
+    }
+
+
+def write_selection(file_path, selection):
+    try:
+        with open(file_path, 'w') as file_obj:
+            json.dump(selection, file_obj, indent=2)
+    except Exception as e:
+        raise customexception(e, sys)
@@ -1,5 +1,6 @@
 import os
 import sys
+import time
 import numpy as np
 import pandas as pd
 from dataclasses import dataclass
@@ -7,32 +8,97 @@ from src.Airbnb.logger import logging
 from src.Airbnb.utils.utils import save_object
 from src.Airbnb.exception import customexception
 from src.Airbnb.utils.utils import evaluate_model
+from src.Airbnb.utils import utils
+from src.Airbnb.utils.stage_cache import StageCache
+from src.Airbnb.components import Native_models
+from src.Airbnb.components.Native_models import get_native_models, evaluate_native_models
+from src.Airbnb.components import Model_selection
+from src.Airbnb.components.Model_selection import measure_model, select_model, write_selection
+from src.Airbnb.components import Compiled_model
+from src.Airbnb.components.Compiled_model import export_compiled_model
 from sklearn.linear_model import LinearRegression, Ridge,Lasso,ElasticNet
 from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
+from sklearn.model_selection import KFold
+from scipy import sparse
+
+
+def split_features_target(array):
+    """Features and target (last column) of a dense array or a CSR matrix, which stays sparse."""
+    if sparse.issparse(array):
+        array = sparse.csr_matrix(array)
+        return array[:, :-1], array[:, -1].toarray().ravel()
+    return array[:, :-1], array[:, -1]
 
 
 @dataclass 
 class ModelTrainerConfig:
     trained_model_file_path = os.path.join('Artifacts','Model.pkl')
-    
+    # Selection policy and every candidate's CV score, size and latency, written next to Model.pkl.
+    selection_file_path = os.path.join('Artifacts','Model_selection.json')
+    # Flat-array export of tree ensembles for PredictPipeline's 'compiled' backend.
+    compiled_model_file_path = os.path.join('Artifacts','Compiled_Model.pkl')
+    # Every model and grid point is scored on the same folds; the search score is the reported CV score.
+    cv_folds = 3
+    cv_random_state = 42
+    # Core budget shared by all searches (-1: all cores).
+    n_jobs = int(os.environ.get('AIRBNB_TRAIN_JOBS', -1))
+    # 'grid' (exhaustive) or 'halving' (successive halving on row subsamples, for grids larger than the factor).
+    search = os.environ.get('AIRBNB_SEARCH', 'grid')
+    # Each halving round keeps 1/factor of the configs; max_resources caps the rows per fit in the last round.
+    halving = {
+        'factor': 3,
+        'min_resources': None,
+        'max_resources': int(os.environ['AIRBNB_SEARCH_MAX_ROWS']) if 'AIRBNB_SEARCH_MAX_ROWS' in os.environ else None
+    }
+    params = {
+        "LinearRegression":{},
+        "Lasso":{
+            'alpha': [0.1, 1.0, 10.0]
+        },
+        "Ridge":{
+            'alpha': [0.1, 1.0, 10.0]
+        },
+        "Elasticnet":{
+            'alpha': [0.1, 1.0, 10.0],
+            'l1_ratio': [0.1, 0.5, 0.9]
+        },
+        "RandomForestRegressor":{
+            'n_estimators': [50, 100, 200],
+            'max_depth': [10, 20, None],
+            'min_samples_split': [2, 5]
+        },
+        "GradientBoostingRegressor":{
+            'n_estimators': [50, 100, 200],
+            'learning_rate': [0.05, 0.1, 0.2],
+            'max_depth': [3, 5, 8]
+        }
+    }
+    # Candidates over any SLO are dropped (unless all are); of those within score_tolerance CV R2
+    # of the best, the one with the lowest single-row p99 latency (then size) wins. None disables an SLO.
+    selection_policy = {
+        'score_tolerance': float(os.environ.get('AIRBNB_SCORE_TOLERANCE', 0.002)),
+        'max_model_mb': float(os.environ['AIRBNB_MAX_MODEL_MB']) if 'AIRBNB_MAX_MODEL_MB' in os.environ else None,
+        'max_row_p99_ms': float(os.environ['AIRBNB_MAX_ROW_P99_MS']) if 'AIRBNB_MAX_ROW_P99_MS' in os.environ else None,
+        'max_batch_p99_ms': float(os.environ['AIRBNB_MAX_BATCH_P99_MS']) if 'AIRBNB_MAX_BATCH_P99_MS' in os.environ else None
+    }
+    latency_batch_size = 256
+    # Histogram boosting on the native (unscaled, categorical) arrays, early-stopped on the validation split.
+    native_models = os.environ.get('AIRBNB_NATIVE_MODELS', '1') not in ('0', 'false', 'False')
+    early_stopping_rounds = 20
+    native_params = {
+        "HistGradientBoostingRegressor":{'learning_rate': 0.1, 'max_iter': 1000, 'max_leaf_nodes': 31},
+        "XGBRegressor":{'learning_rate': 0.1, 'n_estimators': 1000, 'max_depth': 6},
+        "CatBoostRegressor":{'learning_rate': 0.1, 'iterations': 1000, 'depth': 6}
+    }
+
     
 class ModelTrainer:
     def __init__(self):
         self.model_trainer_config = ModelTrainerConfig()
-    
-    def initate_model_training(self,train_array,val_array,test_array):
-        try:
-            logging.info('Splitting Dependent and Independent variables from train, val and test data')
-            X_train, y_train, X_val, y_val, X_test, y_test = (
-                train_array[:,:-1],
-                train_array[:,-1],
-                val_array[:,:-1],
-                val_array[:,-1],
-                test_array[:,:-1],
-                test_array[:,-1]
-            )
+        self.stage_cache = StageCache()
 
-            models={
+    def get_models(self):
+        return {
             'LinearRegression':LinearRegression(),
             'Lasso':Lasso(),
             'Ridge':Ridge(),
@@ -40,44 +106,76 @@ class ModelTrainer:
             'RandomForestRegressor':RandomForestRegressor(),
             'GradientBoostingRegressor':GradientBoostingRegressor()
         }
-            
-            params={
-                "LinearRegression":{},
-                "Lasso":{
-                    'alpha': [0.1, 1.0, 10.0]
-                },
-                "Ridge":{
-                    'alpha': [0.1, 1.0, 10.0]
-                },
-                "Elasticnet":{
-                    'alpha': [0.1, 1.0, 10.0],
-                    'l1_ratio': [0.1, 0.5, 0.9]
-                },
-                "RandomForestRegressor":{
-                    'n_estimators': [50, 100, 200],
-                    'max_depth': [10, 20, None],
-                    'min_samples_split': [2, 5]
+
+    def get_native_models(self, categorical_features, n_features):
+        config = self.model_trainer_config
+        return get_native_models(categorical_features, n_features, config.native_params,
+                                 early_stopping_rounds=config.early_stopping_rounds, n_jobs=config.n_jobs)
+    
+    def initate_model_training(self,train_array,val_array,test_array,native_arrays=None,categorical_features=None):
+        try:
+            use_native = self.model_trainer_config.native_models and native_arrays is not None
+            fingerprint = self.stage_cache.fingerprint(
+                inputs=[],
+                arrays=[train_array, val_array, test_array] + (list(native_arrays) if use_native else []),
+                config={
+                    'models': {name: model.get_params(deep=False) for name, model in self.get_models().items()},
+                    'params': self.model_trainer_config.params,
+                    'cv': [self.model_trainer_config.cv_folds, self.model_trainer_config.cv_random_state],
+                    'search': [self.model_trainer_config.search, self.model_trainer_config.halving],
+                    'native': [use_native, list(categorical_features or []), self.model_trainer_config.native_params,
+                               self.model_trainer_config.early_stopping_rounds],
+                    'selection': [self.model_trainer_config.selection_policy, self.model_trainer_config.latency_batch_size]
                 },
-                "GradientBoostingRegressor":{
-                    'n_estimators': [50, 100, 200],
-                    'learning_rate': [0.05, 0.1, 0.2],
-                    'max_depth': [3, 5, 8]
-                }
-            }
-            
+                modules=[sys.modules[__name__], utils, Native_models, Model_selection, Compiled_model]
+            )
+            if self.stage_cache.is_fresh('model_training', fingerprint):
+                logging.info('Training data, models and grids unchanged, keeping the stored model')
+                return
+            start = time.perf_counter()
+
+            logging.info('Splitting Dependent and Independent variables from train, val and test data')
+            X_train, y_train = split_features_target(train_array)
+            X_val, y_val = split_features_target(val_array)
+            X_test, y_test = split_features_target(test_array)
+
+            models = self.get_models()
+            params = self.model_trainer_config.params
+
             logging.info(f"Validation Set Shape: {X_val.shape}")
 
-            model_report:dict=evaluate_model(X_train,y_train,X_test,y_test,models,params)
+            config = self.model_trainer_config
+            cv = KFold(n_splits=config.cv_folds, shuffle=True, random_state=config.cv_random_state)
+            model_report:dict=evaluate_model(X_train,y_train,X_test,y_test,models,params,cv=cv,n_jobs=config.n_jobs,
+                                                 search=config.search,halving=config.halving)
+            measure_inputs = {name: X_test for name in models}
+
+            if use_native:
+                X_train_native, y_train_native = split_features_target(native_arrays[0])
+                X_val_native, y_val_native = split_features_target(native_arrays[1])
+                X_test_native, y_test_native = split_features_target(native_arrays[2])
+                native_models = self.get_native_models(categorical_features, X_train_native.shape[1])
+                model_report.update(evaluate_native_models(X_train_native, y_train_native, X_val_native, y_val_native,
+                                                           X_test_native, y_test_native, native_models, cv))
+                models.update(native_models)
+                measure_inputs.update({name: X_test_native for name in native_models})
             print(model_report)
             print('\n====================================================================================\n')
             logging.info(f'Model Report : {model_report}')
 
-            best_model_score = max(sorted(model_report.values()))
+            measurements = {}
+            for name in model_report:
+                measurements[name] = measure_model(models[name], measure_inputs[name], batch_size=config.latency_batch_size)
+                logging.info(f"{name}: {measurements[name]['size_bytes'] / 1024:.0f} KB, "
+                             f"row p50/p99 {measurements[name]['row']['p50_ms']:.2f}/{measurements[name]['row']['p99_ms']:.2f} ms, "
+                             f"batch of {measurements[name]['batch']['size']} p50/p99 "
+                             f"{measurements[name]['batch']['p50_ms']:.2f}/{measurements[name]['batch']['p99_ms']:.2f} ms")
 
-            best_model_name = list(model_report.keys())[
-                list(model_report.values()).index(best_model_score)
-            ]
+            best_model_name, selection = select_model(model_report, measurements, config.selection_policy)
+            best_model_score = model_report[best_model_name]
+            logging.info(f"Selection policy {config.selection_policy}: {selection['near_best']} within tolerance of the best CV score")
             
+            # Already refit on the full training set by its search.
             best_model = models[best_model_name]
 
             print(f'Best Model Found , Model Name : {best_model_name} , R2 Score : {best_model_score}')
@@ -85,6 +183,13 @@ class ModelTrainer:
             logging.info(f'Best Model Found , Model Name : {best_model_name} , R2 Score : {best_model_score}')
 
             save_object(file_path=self.model_trainer_config.trained_model_file_path,obj=best_model)
+            write_selection(config.selection_file_path, selection)
+            compiled_model = export_compiled_model(config.trained_model_file_path, config.compiled_model_file_path,
+                                                   best_model, measure_inputs[best_model_name])
+            self.stage_cache.record('model_training', fingerprint,
+                                    [config.trained_model_file_path, config.selection_file_path] +
+                                    ([config.compiled_model_file_path] if compiled_model is not None else []),
+                                    time.perf_counter() - start)
           
         except Exception as e:
             logging.info('Exception occured at Model Training')
@@ -0,0 +1,148 @@
+import sys
+import time
+import numpy as np
+import pandas as pd
+from src.Airbnb.logger import logging
+from src.Airbnb.exception import customexception
+from sklearn.base import BaseEstimator, RegressorMixin, clone
+from sklearn.ensemble import HistGradientBoostingRegressor
+from sklearn.metrics import r2_score, mean_squared_error
+from sklearn.model_selection import cross_val_score
+
+# XGBoost and CatBoost are optional; their candidates are skipped when the package is missing.
+try:
+    from xgboost import XGBRegressor
+except ImportError:
+    XGBRegressor = None
+
+try:
+    from catboost import CatBoostRegressor
+except ImportError:
+    CatBoostRegressor = None
+
+
+def _backend(estimator):
+    return type(estimator).__module__.split('.')[0]
+
+
+class NativeCategoricalRegressor(RegressorMixin, BaseEstimator):
+    """
+    Histogram boosting model (HistGradientBoosting, XGBoost or CatBoost) trained on the native
+    preprocessor's output: unscaled numerics and ordinal category codes in categorical_features.
+    fit() early-stops on (X_val, y_val) when given; with_iterations() returns an unfitted copy that
+    trains for a fixed number of iterations, for cross-validation.
+    """
+
+    # Serving uses Native_Preprocessor.pkl instead of Preprocessor.pkl for these models.
+    native_categorical = True
+
+    def __init__(self, estimator, categorical_features=()):
+        self.estimator = estimator
+        self.categorical_features = categorical_features
+
+    def _inputs(self, X):
+        if _backend(self.estimator) != 'catboost':
+            return X
+        # CatBoost needs integer (or string) category values; missing/unseen categories become -1.
+        frame = pd.DataFrame(np.asarray(X, dtype=np.float64))
+        for j in self.categorical_features:
+            frame[j] = np.nan_to_num(frame[j].to_numpy(), nan=-1).astype(np.int64)
+        return frame
+
+    def fit(self, X, y, X_val=None, y_val=None):
+        self.estimator_ = clone(self.estimator)
+        backend = _backend(self.estimator_)
+        # CatBoost takes cat_features at fit time; in the constructor it breaks sklearn's clone().
+        kwargs = {'cat_features': list(self.categorical_features)} if backend == 'catboost' else {}
+        if X_val is not None:
+            if backend == 'sklearn':
+                kwargs = {'X_val': X_val, 'y_val': y_val}
+            elif backend == 'xgboost':
+                kwargs = {'eval_set': [(X_val, y_val)], 'verbose': False}
+            else:
+                kwargs['eval_set'] = (self._inputs(X_val), y_val)
+        self.estimator_.fit(self._inputs(X), y, **kwargs)
+        return self
+
+    @property
+    def n_iterations_(self):
+        backend = _backend(self.estimator_)
+        if backend == 'sklearn':
+            return int(self.estimator_.n_iter_)
+        if backend == 'xgboost':
+            best = getattr(self.estimator_, 'best_iteration', None)
+            return int(best) + 1 if best is not None else int(self.estimator_.n_estimators)
+        return int(self.estimator_.tree_count_)
+
+    def with_iterations(self, n_iterations):
+        estimator = clone(self.estimator)
+        backend = _backend(estimator)
+        if backend == 'sklearn':
+            estimator.set_params(max_iter=n_iterations, early_stopping=False)
+        elif backend == 'xgboost':
+            estimator.set_params(n_estimators=n_iterations, early_stopping_rounds=None)
+        else:
+            # CatBoost cannot reset early_stopping_rounds through set_params.
+            params = {key: value for key, value in estimator.get_params().items() if key != 'early_stopping_rounds'}
+            estimator = type(estimator)(**dict(params, iterations=n_iterations))
+        return NativeCategoricalRegressor(estimator, self.categorical_features)
+
+    def predict(self, X):
+        return self.estimator_.predict(self._inputs(X))
+
+
+def get_native_models(categorical_features, n_features, params, early_stopping_rounds=20, n_jobs=-1, random_state=42):
+    """Native-categorical candidates for the installed libraries, keyed like ModelTrainer.get_models()."""
+    categorical_features = list(categorical_features)
+    mask = np.zeros(n_features, dtype=bool)
+    mask[categorical_features] = True
+
+    models = {
+        'HistGradientBoostingRegressor': HistGradientBoostingRegressor(
+            categorical_features=mask, early_stopping=True, n_iter_no_change=early_stopping_rounds,
+            random_state=random_state, **params.get('HistGradientBoostingRegressor', {}))
+    }
+    if XGBRegressor is not None:
+        models['XGBRegressor'] = XGBRegressor(
+            tree_method='hist', enable_categorical=True, feature_types=['c' if is_cat else 'q' for is_cat in mask],
+            early_stopping_rounds=early_stopping_rounds, n_jobs=n_jobs, random_state=random_state,
+            **params.get('XGBRegressor', {}))
+    else:
+        logging.info('xgboost is not installed, skipping XGBRegressor')
+    if CatBoostRegressor is not None:
+        models['CatBoostRegressor'] = CatBoostRegressor(
+            early_stopping_rounds=early_stopping_rounds, verbose=False,
+            thread_count=n_jobs, random_seed=random_state, allow_writing_files=False,
+            **params.get('CatBoostRegressor', {}))
+    else:
+        logging.info('catboost is not installed, skipping CatBoostRegressor')
+
+    return {name: NativeCategoricalRegressor(model, categorical_features) for name, model in models.items()}
+
+
+def evaluate_native_models(X_train, y_train, X_val, y_val, X_test, y_test, models, cv):
+    """
+    Fits each model on the training set with early stopping on the validation split, then scores
+    that many iterations on the shared CV folds so the report is comparable with evaluate_model.
+    Each fitted model is written back into `models`.
+    """
+    try:
+        report = {}
+        for name, model in models.items():
+            start = time.perf_counter()
+            model.fit(X_train, y_train, X_val=X_val, y_val=y_val)
+            n_iterations = model.n_iterations_
+            cv_score = cross_val_score(model.with_iterations(n_iterations), X_train, y_train, cv=cv, scoring='r2').mean()
+
+            y_test_pred = model.predict(X_test)
+            logging.info(f"Model: {name} ({n_iterations} iterations after early stopping, {time.perf_counter() - start:.1f}s)")
+            logging.info(f"   - CV Score (R2): {cv_score:.4f}")
+            logging.info(f"   - Validation Score (R2): {r2_score(y_val, model.predict(X_val)):.4f}")
+            logging.info(f"   - Test Score (R2): {r2_score(y_test, y_test_pred):.4f}")
+            logging.info(f"   - RMSE: {np.sqrt(mean_squared_error(y_test, y_test_pred)):.4f}")
+            report[name] = cv_score
+
+        return report
+    except Exception as e:
+        logging.info('Exception occured during native model training')
+        raise customexception(e, sys)
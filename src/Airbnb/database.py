@@ -1,44 +1,306 @@
 import sqlite3
 import os
-from datetime import datetime
+import time
+import queue
+import atexit
+import weakref
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from src.Airbnb.logger import logging
+
+CREATE_PREDICTIONS_SQL = '''
+    CREATE TABLE IF NOT EXISTS predictions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        city TEXT,
+        property_type TEXT,
+        room_type TEXT,
+        accommodates INTEGER,
+        price REAL,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+INSERT_PREDICTION_SQL = '''
+    INSERT INTO predictions (city, property_type, room_type, accommodates, price, timestamp)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+
+CREATE_TIMESTAMP_INDEX_SQL = 'CREATE INDEX IF NOT EXISTS idx_predictions_timestamp ON predictions (timestamp)'
+
+SELECT_HISTORY_SQL = 'SELECT * FROM predictions ORDER BY timestamp DESC, id DESC LIMIT ?'
+
+
+_STOP = object()
+
+
+def _close_in_owner(conn, pid):
+    # A connection inherited across fork is never closed in the child: the parent's locks are not
+    # inherited, so closing could checkpoint and remove a WAL the parent is still using.
+    if os.getpid() == pid:
+        conn.close()
+
+
+class _ThreadConnection:
+    """A thread's connection, closed when the thread exits and its threading.local slot is dropped."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.pid = os.getpid()
+        self.close = weakref.finalize(self, _close_in_owner, conn, self.pid)
+
+
+def _utc_timestamp():
+    # Same format as SQLite's CURRENT_TIMESTAMP, taken when the prediction is made rather than when it is flushed.
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
 
 class Database:
-    def __init__(self, db_name="airbnb_history.db"):
+    def __init__(self, db_name="airbnb_history.db", timeout=5.0, cache_size_kb=8192,
+                 write_behind=False, flush_size=100, flush_interval=1.0, max_pending=10000, history_size=10):
         self.db_name = os.path.join("Artifacts", db_name)
+        self.timeout = timeout
+        self.cache_size_kb = cache_size_kb
+        self._local = threading.local()
+        self._connections = weakref.WeakSet()
+        self._inherited = []
+        self._connections_lock = threading.Lock()
+
+        self.write_behind = write_behind
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._queue = None
+        self._writer = None
+        self._writer_pid = None
+        self._writer_lock = threading.Lock()
+        self._in_flight = 0
+        self.flushed = 0
+        self.flushes = 0
+        self.dropped = 0
+        self.last_flush_lag = 0.0
+        self.max_flush_lag = 0.0
+
+        # Most recent predictions, oldest first. Kept current by insert_prediction and
+        # reloaded only when another process commits (PRAGMA data_version on the write connection).
+        self.history_size = history_size
+        self._history = deque(maxlen=history_size)
+        self._unflushed = {}
+        self._next_seq = 0
+        self._history_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._write_holder = None
+        self._history_version = None
+        self._history_stale = True
+        self.history_hits = 0
+        self.history_reloads = 0
+
         self.init_db()
+        if write_behind:
+            atexit.register(self.close)
+
+    def _connect(self):
+        # One connection per thread; check_same_thread is off only so close() and the
+        # thread-exit finalizer can run from any thread.
+        conn = sqlite3.connect(self.db_name, timeout=self.timeout, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA cache_size=-{self.cache_size_kb}')
+        conn.execute(f'PRAGMA busy_timeout={int(self.timeout * 1000)}')
+        return conn
+
+    def get_connection(self):
+        holder = getattr(self._local, 'holder', None)
+        if holder is not None and holder.pid == os.getpid():
+            return holder.conn
+        # Connections must not be shared with a forked child, so reconnect when the pid changes,
+        # keeping the inherited one referenced so it is not closed here either.
+        if holder is not None:
+            self._inherited.append(holder)
+        holder = _ThreadConnection(self._connect())
+        self._local.holder = holder
+        with self._connections_lock:
+            self._connections.add(holder)
+        return holder.conn
+
+    def _ensure_writer(self):
+        # Threads and queues do not survive fork, so each process starts its own writer.
+        if self._writer is not None and self._writer_pid == os.getpid():
+            return
+        with self._writer_lock:
+            if self._writer is None or self._writer_pid != os.getpid():
+                self._queue = queue.Queue(maxsize=self.max_pending)
+                self._in_flight = 0
+                self._writer_pid = os.getpid()
+                self._writer = threading.Thread(target=self._run_writer, name='db-writer', daemon=True)
+                self._writer.start()
+
+    def _run_writer(self):
+        pending_queue = self._queue
+        batch = []
+        stopping = False
+        while not stopping:
+            timeout = self.flush_interval if not batch else max(batch[0][2] + self.flush_interval - time.monotonic(), 0)
+            try:
+                item = pending_queue.get(timeout=timeout)
+                if item is _STOP:
+                    stopping = True
+                    batch.extend(self._drain(pending_queue))
+                else:
+                    batch.append(item)
+                    self._in_flight = len(batch)
+            except queue.Empty:
+                pass
+
+            due = batch and (len(batch) >= self.flush_size or time.monotonic() - batch[0][2] >= self.flush_interval)
+            if batch and (due or stopping):
+                self._flush(batch)
+                batch = []
+                self._in_flight = 0
+
+    @staticmethod
+    def _drain(pending_queue):
+        items = []
+        while True:
+            try:
+                item = pending_queue.get_nowait()
+            except queue.Empty:
+                return items
+            if item is not _STOP:
+                items.append(item)
+
+    def _write_connection(self):
+        # Callers hold _write_lock. All of this process's writes go through this one connection,
+        # so its PRAGMA data_version only changes when another process commits.
+        holder = self._write_holder
+        if holder is None or holder.pid != os.getpid():
+            if holder is not None:
+                self._inherited.append(holder)
+            holder = _ThreadConnection(self._connect())
+            self._write_holder = holder
+            with self._connections_lock:
+                self._connections.add(holder)
+        return holder.conn
+
+    def _data_version(self):
+        with self._write_lock:
+            return self._write_connection().execute('PRAGMA data_version').fetchone()[0]
+
+    def _write(self, rows):
+        with self._write_lock:
+            conn = self._write_connection()
+            with conn:
+                if len(rows) == 1:
+                    return conn.execute(INSERT_PREDICTION_SQL, rows[0]).lastrowid
+                conn.executemany(INSERT_PREDICTION_SQL, rows)
+                return None
+
+    def _flush(self, batch):
+        try:
+            self._write([row for _, row, _ in batch])
+            with self._history_lock:
+                for seq, _, _ in batch:
+                    self._unflushed.pop(seq, None)
+            lag = time.monotonic() - batch[0][2]
+            self.flushed += len(batch)
+            self.flushes += 1
+            self.last_flush_lag = lag
+            self.max_flush_lag = max(self.max_flush_lag, lag)
+        except Exception as e:
+            self.dropped += len(batch)
+            with self._history_lock:
+                for seq, _, _ in batch:
+                    self._unflushed.pop(seq, None)
+            self._history_stale = True
+            logging.info(f'Write-behind flush of {len(batch)} predictions failed: {e}')
+
+    def flush(self):
+        """Stop the writer after it commits everything queued so far; the next insert restarts it."""
+        with self._writer_lock:
+            writer = self._writer
+            if writer is None or self._writer_pid != os.getpid():
+                return
+            self._queue.put(_STOP)
+            writer.join()
+            self._writer = None
+
+    def write_stats(self):
+        pending = (self._queue.qsize() if self._queue is not None else 0) + self._in_flight
+        return {
+            'write_behind': self.write_behind,
+            'pending': pending,
+            'flushed': self.flushed,
+            'flushes': self.flushes,
+            'dropped': self.dropped,
+            'last_flush_lag_seconds': round(self.last_flush_lag, 6),
+            'max_flush_lag_seconds': round(self.max_flush_lag, 6),
+            'history_hits': self.history_hits,
+            'history_reloads': self.history_reloads
+        }
+
+    def close(self):
+        if self.write_behind:
+            self.flush()
+            conn = self.get_connection()
+            conn.execute('PRAGMA wal_checkpoint(FULL)')
+        with self._connections_lock:
+            holders, self._connections = list(self._connections), weakref.WeakSet()
+        self._write_holder = None
+        for holder in holders:
+            holder.close()
+        self._local = threading.local()
 
     def init_db(self):
         os.makedirs(os.path.dirname(self.db_name), exist_ok=True)
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS predictions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                city TEXT,
-                property_type TEXT,
-                room_type TEXT,
-                accommodates INTEGER,
-                price REAL,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        conn.commit()
-        conn.close()
+        with self._write_lock:
+            conn = self._write_connection()
+            with conn:
+                conn.execute(CREATE_PREDICTIONS_SQL)
+                conn.execute(CREATE_TIMESTAMP_INDEX_SQL)
+        self._reload_history(self._data_version())
 
     def insert_prediction(self, city, property_type, room_type, accommodates, price):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO predictions (city, property_type, room_type, accommodates, price)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (city, property_type, room_type, accommodates, price))
-        conn.commit()
-        conn.close()
+        row = (city, property_type, room_type, accommodates, price, _utc_timestamp())
+        if self.write_behind:
+            self._ensure_writer()
+            with self._history_lock:
+                seq = self._next_seq
+                self._next_seq += 1
+                # The id is assigned by SQLite when the row is flushed.
+                history_row = (None,) + row
+                self._unflushed[seq] = history_row
+                self._history.append(history_row)
+            try:
+                self._queue.put_nowait((seq, row, time.monotonic()))
+            except queue.Full:
+                self.dropped += 1
+                with self._history_lock:
+                    self._unflushed.pop(seq, None)
+                    if history_row in self._history:
+                        self._history.remove(history_row)
+            return
+
+        last_id = self._write([row])
+        with self._history_lock:
+            self._history.append((last_id,) + row)
+
+    def _reload_history(self, version):
+        # A commit between reading version and this query only costs one extra reload later.
+        conn = self.get_connection()
+        rows = conn.execute(SELECT_HISTORY_SQL, (self.history_size,)).fetchall()
+        with self._history_lock:
+            unflushed = [self._unflushed[seq] for seq in sorted(self._unflushed)]
+            self._history.clear()
+            self._history.extend(sorted(list(reversed(rows)) + unflushed, key=lambda row: row[6]))
+            self._history_version = version
+            self._history_stale = False
+            self.history_reloads += 1
 
     def get_history(self):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM predictions ORDER BY timestamp DESC LIMIT 10')
-        rows = cursor.fetchall()
-        conn.close()
-        return rows
+        version = self._data_version()
+        if self._history_stale or version != self._history_version:
+            self._reload_history(version)
+        else:
+            self.history_hits += 1
+        with self._history_lock:
+            return list(reversed(self._history))
@@ -0,0 +1,265 @@
+import os
+import sys
+import time
+import random
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import BallTree
+from src.Airbnb.logger import logging
+from src.Airbnb.exception import customexception
+from src.Airbnb.utils.columnar import ColumnarStore, write_columnar
+
+EARTH_RADIUS_KM = 6371.0088
+
+# The only columns of New_Airbnb_Data.csv the web app reads.
+LISTINGS_COLUMNS = ['city', 'room_type', 'name', 'neighbourhood', 'price', 'review_scores_rating', 'latitude', 'longitude']
+
+
+def project_listings(df):
+    """Serving columns of the listings with the display fallbacks for name and neighbourhood applied."""
+    n = len(df)
+    city = df['city'].astype(object).to_numpy() if 'city' in df.columns else np.full(n, None, dtype=object)
+    room_type = df['room_type'].astype(object).to_numpy() if 'room_type' in df.columns else np.full(n, None, dtype=object)
+
+    if 'name' in df.columns:
+        name = df['name'].astype(object).where(df['name'].notna(), 'Apartment').to_numpy()
+    else:
+        name = np.full(n, 'N/A', dtype=object)
+
+    if 'neighbourhood' in df.columns:
+        neigh = df['neighbourhood'].astype(object)
+        fallback = neigh.isna() | (neigh == 'Neighborhood highlights')
+        area = pd.Series(city, index=df.index).astype(str) + ' Area'
+        neighbourhood = neigh.where(~fallback, area).to_numpy()
+    else:
+        neighbourhood = np.full(n, 'N/A', dtype=object)
+
+    def numeric(column):
+        if column not in df.columns:
+            return np.full(n, np.nan)
+        return pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=np.float64)
+
+    return {
+        'city': pd.Categorical(city),
+        'room_type': pd.Categorical(room_type),
+        'name': name,
+        'neighbourhood': pd.Categorical(neighbourhood),
+        'price': numeric('price'),
+        'rating': numeric('review_scores_rating'),
+        'latitude': numeric('latitude'),
+        'longitude': numeric('longitude')
+    }
+
+
+class GeoGroup:
+    """
+    Haversine BallTree over one (city, room_type) group; tree indices point into `positions`.
+    The tree is built by ListingsIndex.build_trees() (or on first use), or taken over from the
+    previous index if the coordinates match.
+    """
+
+    def __init__(self, positions, coords, fingerprint, tree=None):
+        self.positions = positions
+        self.coords = coords
+        self.fingerprint = fingerprint
+        self._tree = tree
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, positions, latitude, longitude, previous=None):
+        coords = np.column_stack([latitude[positions], longitude[positions]])
+        valid = ~np.isnan(coords).any(axis=1)
+        positions, coords = positions[valid], np.radians(coords[valid])
+        fingerprint = hashlib.blake2b(positions.tobytes() + coords.tobytes(), digest_size=16).hexdigest()
+        if previous is not None and previous.fingerprint == fingerprint:
+            return previous
+        return cls(positions, coords, fingerprint)
+
+    @property
+    def tree(self):
+        if self._tree is None and len(self.positions):
+            with self._lock:
+                if self._tree is None:
+                    self._tree = BallTree(self.coords, metric='haversine')
+        return self._tree
+
+
+class ListingsIndex:
+    """
+    (city, room_type) -> row positions over a compact projection of the listings
+    (name, neighbourhood, price, rating) with display fallbacks already applied.
+    """
+
+    def __init__(self, groups, name, neighbourhood, price, rating, geo_groups=None):
+        self.groups = groups
+        self.name = name
+        self.neighbourhood = neighbourhood
+        self.price = price
+        self.rating = rating
+        self.geo_groups = geo_groups or {}
+        self._random = random.Random()
+
+    def __len__(self):
+        return len(self.price)
+
+    @staticmethod
+    def _build_geo_groups(columns, groups, previous=None):
+        latitude = np.asarray(columns['latitude'], dtype=np.float64)
+        longitude = np.asarray(columns['longitude'], dtype=np.float64)
+        old_groups = previous.geo_groups if previous is not None else {}
+        geo_groups = {
+            key: GeoGroup.build(positions, latitude, longitude, old_groups.get(key))
+            for key, positions in groups.items()
+        }
+        reused = sum(1 for key, group in geo_groups.items() if old_groups.get(key) is group)
+        logging.info(f'Spatial index: {len(geo_groups)} groups, {reused} reused from the previous index')
+        return geo_groups
+
+    @classmethod
+    def from_columns(cls, columns, previous=None):
+        try:
+            keys = pd.DataFrame({'city': columns['city'], 'room_type': columns['room_type']})
+            groups = {
+                key: positions.astype(np.int32)
+                for key, positions in keys.groupby(['city', 'room_type'], sort=False, observed=True).indices.items()
+            }
+            geo_groups = cls._build_geo_groups(columns, groups, previous)
+            logging.info(f'Listings index built: {len(keys)} rows, {len(groups)} (city, room_type) groups')
+            return cls(groups, columns['name'], columns['neighbourhood'], columns['price'], columns['rating'], geo_groups)
+        except Exception as e:
+            logging.info('Exception occured while building the listings index')
+            raise customexception(e, sys)
+
+    @classmethod
+    def from_dataframe(cls, df, previous=None):
+        return cls.from_columns(project_listings(df.reset_index(drop=True)), previous)
+
+    def _rows(self, positions, distances_km=None):
+        rows = [
+            {
+                'name': self.name[i],
+                'neighbourhood': self.neighbourhood[i],
+                'price': self.price[i],
+                'rating': self.rating[i]
+            }
+            for i in positions
+        ]
+        if distances_km is not None:
+            for row, distance in zip(rows, distances_km):
+                row['distance_km'] = round(float(distance), 3)
+        return rows
+
+    def build_trees(self):
+        start = time.perf_counter()
+        for group in self.geo_groups.values():
+            group.tree
+        logging.info(f'Spatial index trees ready in {(time.perf_counter() - start) * 1000:.1f} ms')
+
+    def sample(self, city, room_type, k=5):
+        positions = self.groups.get((city, room_type))
+        if positions is None or len(positions) == 0:
+            return []
+        picks = self._random.sample(range(len(positions)), min(k, len(positions)))
+        return self._rows(positions[picks])
+
+    def nearest(self, city, room_type, latitude, longitude, k=5, radius_km=None):
+        group = self.geo_groups.get((city, room_type))
+        if group is None or group.tree is None:
+            return []
+        point = np.radians([[latitude, longitude]])
+        distances, local = group.tree.query(point, k=min(k, len(group.positions)))
+        distances_km = distances[0] * EARTH_RADIUS_KM
+        local = local[0]
+        if radius_km is not None:
+            within = distances_km <= radius_km
+            distances_km, local = distances_km[within], local[within]
+        return self._rows(group.positions[local], distances_km)
+
+
+class ListingsStore:
+    """
+    Holds the current ListingsIndex for a listings CSV.
+
+    The serving columns are kept in a memory-mapped columnar cache next to the CSV, rebuilt only
+    when the CSV's mtime or size changes, so workers start in milliseconds and share the pages.
+    The index is rebuilt in a background thread when the file changes (checked at most every
+    check_interval seconds). With build_trees the BallTrees are built as part of every load, so
+    they are ready before the first nearest() query (and before a preloading server forks).
+    """
+
+    def __init__(self, path, cache_dir=None, check_interval=30.0, build_trees=False):
+        self.path = path
+        self.cache_dir = cache_dir or os.path.join(os.path.dirname(path), 'listings_cache')
+        self.check_interval = check_interval
+        self.build_trees = build_trees
+        self.index = None
+        self.version = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self._reloading = False
+
+    def _file_version(self):
+        stat = os.stat(self.path)
+        return [stat.st_mtime_ns, stat.st_size]
+
+    def available(self):
+        return os.path.exists(self.path) or ColumnarStore.exists(self.cache_dir)
+
+    def build_cache(self):
+        version = self._file_version()
+        df = pd.read_csv(self.path, usecols=lambda column: column in LISTINGS_COLUMNS)
+        write_columnar(self.cache_dir, project_listings(df), meta={'source_version': version})
+        return version
+
+    def load_columns(self):
+        cache_fresh = ColumnarStore.exists(self.cache_dir)
+        if cache_fresh and os.path.exists(self.path):
+            cache_fresh = ColumnarStore(self.cache_dir).meta.get('source_version') == self._file_version()
+        if not cache_fresh:
+            logging.info(f'Building listings cache {self.cache_dir} from {self.path}')
+            self.build_cache()
+
+        store = ColumnarStore(self.cache_dir)
+        columns = {name: store.column(name) for name in store.columns}
+        return columns, store.meta.get('source_version')
+
+    def load(self):
+        try:
+            start = time.perf_counter()
+            columns, version = self.load_columns()
+            index = ListingsIndex.from_columns(columns, previous=self.index)
+            if self.build_trees:
+                index.build_trees()
+            self.index = index
+            self.version = version
+            self._last_check = time.monotonic()
+            logging.info(f'Listings loaded in {(time.perf_counter() - start) * 1000:.1f} ms')
+            return self.index
+        except Exception as e:
+            logging.info(f'Exception occured while loading listings from {self.path}')
+            raise customexception(e, sys)
+
+    def _reload(self):
+        try:
+            self.load()
+        except Exception as e:
+            logging.info(f'Listings reload failed: {e}')
+        finally:
+            self._reloading = False
+
+    def get(self):
+        now = time.monotonic()
+        if now - self._last_check >= self.check_interval:
+            with self._lock:
+                if now - self._last_check >= self.check_interval and not self._reloading:
+                    self._last_check = now
+                    try:
+                        changed = self._file_version() != self.version
+                    except OSError:
+                        changed = False
+                    if changed:
+                        self._reloading = True
+                        threading.Thread(target=self._reload, name='listings-reload', daemon=True).start()
+        return self.index
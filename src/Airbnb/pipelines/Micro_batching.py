@@ -0,0 +1,150 @@
+import os
+import sys
+import time
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future
+import numpy as np
+from src.Airbnb.logger import logging
+from src.Airbnb.exception import customexception
+
+
+class MicroBatcher:
+    """
+    Collects concurrent prediction requests for up to max_wait_ms (or max_batch_size rows)
+    and scores them with a single call to predict_fn.
+
+    stats() reports the wait inside the collection window (added_wait_ms) apart from the time
+    a request spent queued while the previous batch was being scored (queue_wait_ms).
+    """
+
+    def __init__(self, predict_fn, max_batch_size=64, max_wait_ms=5.0):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._worker_pid = None
+
+        self.batches = 0
+        self.requests = 0
+        self.fallbacks = 0
+        self.batch_sizes = {}
+        self.total_wait = 0.0
+        self.max_wait_seen = 0.0
+        self.recent_waits = deque(maxlen=1024)
+        self.total_queue_wait = 0.0
+        self.max_queue_wait_seen = 0.0
+        self.recent_queue_waits = deque(maxlen=1024)
+
+    def _ensure_worker(self):
+        # Threads do not survive fork, so a pre-forked worker starts its own.
+        if self._worker is not None and self._worker_pid == os.getpid() and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or self._worker_pid != os.getpid() or not self._worker.is_alive():
+                if self._worker_pid != os.getpid():
+                    self._queue = queue.Queue()
+                self._worker_pid = os.getpid()
+                self._worker = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+                self._worker.start()
+
+    def submit(self, items):
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((items, future, time.perf_counter()))
+        return future
+
+    def predict(self, items, timeout=None):
+        try:
+            return self.submit(items).result(timeout=timeout)
+        except Exception as e:
+            raise customexception(e, sys)
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        opened = time.perf_counter()
+        rows = len(batch[0][0])
+        deadline = batch[0][2] + self.max_wait
+        while rows < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(request)
+            rows += len(request[0])
+        return batch, rows, opened
+
+    def _run(self):
+        while True:
+            batch, rows, opened = self._collect()
+            dispatched = time.perf_counter()
+            self._record(batch, rows, opened, dispatched)
+
+            items = [item for request_items, _, _ in batch for item in request_items]
+            try:
+                predictions = self.predict_fn(items)
+            except Exception as e:
+                logging.info(f'Micro-batch of {rows} rows failed, scoring requests one by one: {e}')
+                self._score_individually(batch)
+                continue
+
+            start = 0
+            for request_items, future, _ in batch:
+                end = start + len(request_items)
+                future.set_result(np.asarray(predictions[start:end]))
+                start = end
+
+    def _score_individually(self, batch):
+        with self._lock:
+            self.fallbacks += 1
+        for request_items, future, _ in batch:
+            try:
+                future.set_result(np.asarray(self.predict_fn(request_items)))
+            except Exception as e:
+                future.set_exception(e)
+
+    def _record(self, batch, rows, opened, dispatched):
+        # Requests enqueued before the window opened were waiting on the previous predict_fn call.
+        with self._lock:
+            self.batches += 1
+            self.requests += len(batch)
+            self.batch_sizes[rows] = self.batch_sizes.get(rows, 0) + 1
+            for _, _, enqueued in batch:
+                wait = dispatched - max(enqueued, opened)
+                self.total_wait += wait
+                self.max_wait_seen = max(self.max_wait_seen, wait)
+                self.recent_waits.append(wait)
+                queue_wait = max(opened - enqueued, 0.0)
+                self.total_queue_wait += queue_wait
+                self.max_queue_wait_seen = max(self.max_queue_wait_seen, queue_wait)
+                self.recent_queue_waits.append(queue_wait)
+
+    def _summary(self, total, max_seen, recent):
+        waits = np.array(recent) * 1000
+        return {
+            'mean': total * 1000 / self.requests if self.requests else 0.0,
+            'p50': float(np.percentile(waits, 50)) if len(waits) else 0.0,
+            'p99': float(np.percentile(waits, 99)) if len(waits) else 0.0,
+            'max': max_seen * 1000
+        }
+
+    def stats(self):
+        with self._lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000,
+                'batches': self.batches,
+                'requests': self.requests,
+                'fallbacks': self.fallbacks,
+                'batch_size_distribution': {str(size): count for size, count in sorted(self.batch_sizes.items())},
+                'mean_batch_requests': self.requests / self.batches if self.batches else 0.0,
+                'added_wait_ms': self._summary(self.total_wait, self.max_wait_seen, self.recent_waits),
+                'queue_wait_ms': self._summary(self.total_queue_wait, self.max_queue_wait_seen, self.recent_queue_waits)
+            }
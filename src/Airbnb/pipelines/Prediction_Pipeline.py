@@ -1,26 +1,277 @@
 import os
+import math
+import numbers
 import numpy as np
 import sys
+import time
+import threading
 import pandas as pd
+from collections import OrderedDict
+from dataclasses import dataclass
 from src.Airbnb.logger import logging
-from src.Airbnb.utils.utils import load_object
+from src.Airbnb.utils.artifact_cache import artifact_cache
+from src.Airbnb.utils.utils import file_digest
 from src.Airbnb.exception import customexception
 
 
+@dataclass
+class PredictPipelineConfig:
+    preprocessor_path:str = os.path.join("Artifacts", "Preprocessor.pkl")
+    model_path:str = os.path.join("Artifacts", "Model.pkl")
+    compiled_preprocessor_path:str = os.path.join("Artifacts", "Compiled_Preprocessor.pkl")
+    # Used instead of the two above when the model is native-categorical (see Native_models).
+    native_preprocessor_path:str = os.path.join("Artifacts", "Native_Preprocessor.pkl")
+    compiled_native_preprocessor_path:str = os.path.join("Artifacts", "Compiled_Native_Preprocessor.pkl")
+    # 'compiled': flat-array tree ensemble (Compiled_Model.pkl) when it is fresh and the batch is
+    # within its max_batch_rows, model.predict otherwise; 'sklearn': always model.predict.
+    model_backend:str = os.environ.get("AIRBNB_MODEL_BACKEND", "compiled")
+    compiled_model_path:str = os.path.join("Artifacts", "Compiled_Model.pkl")
+    cache_size:int = int(os.environ.get("AIRBNB_PREDICTION_CACHE_SIZE", 4096))
+    cache_ttl_seconds:float = float(os.environ.get("AIRBNB_PREDICTION_CACHE_TTL", 0)) or None
+    cache_coordinate_decimals:int = int(os.environ["AIRBNB_PREDICTION_CACHE_COORD_DECIMALS"]) \
+        if "AIRBNB_PREDICTION_CACHE_COORD_DECIMALS" in os.environ else None
+
+
+def _tf_flag(value):
+    if value in (True, '1', 't', 'true', 'True'):
+        return 't'
+    if value in (False, '0', 'f', 'false', 'False'):
+        return 'f'
+    raise ValueError(value)
+
+
+def _bool_flag(value):
+    return 'True' if _tf_flag(value) == 't' else 'False'
+
+
+def _category(value):
+    # str() would turn lists, numbers and booleans into categories like "['a']".
+    if not isinstance(value, str):
+        raise ValueError(value)
+    return value
+
+
+def _finite(convert):
+    """Numeric converter that rejects booleans, containers and NaN/inf (including "nan" and 1e400)."""
+    def converter(value):
+        if isinstance(value, (bool, np.bool_)) or not isinstance(value, (numbers.Real, str)):
+            raise ValueError(value)
+        if not math.isfinite(float(value)):
+            raise ValueError(value)
+        return convert(value)
+    return converter
+
+
+# Feature name -> converter used to validate JSON records, in the column order of CustomData.
+FEATURE_TYPES = {
+    'property_type': _category,
+    'room_type': _category,
+    'amenities': _finite(int),
+    'accommodates': _finite(int),
+    'bathrooms': _finite(float),
+    'bed_type': _category,
+    'cancellation_policy': _category,
+    'cleaning_fee': _bool_flag,
+    'city': _category,
+    'host_has_profile_pic': _tf_flag,
+    'host_identity_verified': _tf_flag,
+    'host_response_rate': _finite(int),
+    'instant_bookable': _tf_flag,
+    'latitude': _finite(float),
+    'longitude': _finite(float),
+    'number_of_reviews': _finite(int),
+    'review_scores_rating': _finite(int),
+    'bedrooms': _finite(int),
+    'beds': _finite(int)
+}
+
+
+def _amenity_list(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(str(item) for item in value)
+    if isinstance(value, str):
+        return value
+    raise ValueError(value)
+
+
+# Optional fields; a listing without an amenity list is featurized with the training amenity frequencies.
+OPTIONAL_FEATURE_TYPES = {
+    'amenity_list': _amenity_list
+}
+
+
+# Source path -> (version, sha256), so compiled artifacts are only trusted for the file they were built from.
+_source_digests = {}
+
+
+def _source_digest(file_path):
+    version = artifact_cache.version(file_path) or artifact_cache.file_version(file_path)
+    cached = _source_digests.get(file_path)
+    if cached is None or cached[0] != version:
+        cached = _source_digests[file_path] = (version, file_digest(file_path))
+    return cached[1]
+
+
+class PredictionCache:
+    """
+    Bounded LRU (optionally TTL) cache of predictions keyed on CustomData.cache_key().
+    Entries are dropped as soon as the artifact version they were computed with changes.
+    """
+
+    def __init__(self, max_size=4096, ttl_seconds=None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def set_version(self, version):
+        if version != self.version:
+            with self._lock:
+                if version != self.version:
+                    if self.version is not None:
+                        self.invalidations += 1
+                    self._entries.clear()
+                    self.version = version
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (self.ttl_seconds is None or time.monotonic() - entry[1] < self.ttl_seconds):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+            'invalidations': self.invalidations
+        }
+
+
 class PredictPipeline:
     def __init__(self):
-        pass
+        self.predict_pipeline_config = PredictPipelineConfig()
+        config = self.predict_pipeline_config
+        self.cache = PredictionCache(config.cache_size, config.cache_ttl_seconds) if config.cache_size > 0 else None
+
+    def preprocessor_paths(self, model=None):
+        """Preprocessor and compiled preprocessor the model was trained on."""
+        config = self.predict_pipeline_config
+        if model is None and os.path.exists(config.model_path):
+            model = artifact_cache.get(config.model_path)
+        if getattr(model, 'native_categorical', False):
+            return config.native_preprocessor_path, config.compiled_native_preprocessor_path
+        return config.preprocessor_path, config.compiled_preprocessor_path
+
+    def load_artifacts(self):
+        try:
+            model = artifact_cache.get(self.predict_pipeline_config.model_path)
+            preprocessor = artifact_cache.get(self.preprocessor_paths(model)[0])
+            return preprocessor, model
+        except Exception as e:
+            raise customexception(e, sys)
     
+    def load_compiled_preprocessor(self, model=None):
+        preprocessor_path, compiled_path = self.preprocessor_paths(model)
+        if not os.path.exists(compiled_path):
+            return None
+        try:
+            compiled = artifact_cache.get(compiled_path)
+            if compiled.source_digest != _source_digest(preprocessor_path):
+                logging.info(f'Compiled preprocessor is stale, falling back to {preprocessor_path}')
+                return None
+            return compiled
+        except Exception as e:
+            logging.info(f'Compiled preprocessor unavailable: {e}')
+            return None
+
+    def load_compiled_model(self):
+        config = self.predict_pipeline_config
+        if config.model_backend != 'compiled' or not os.path.exists(config.compiled_model_path):
+            return None
+        try:
+            compiled = artifact_cache.get(config.compiled_model_path)
+            if compiled.source_digest != _source_digest(config.model_path):
+                logging.info('Compiled model is stale, falling back to Model.pkl')
+                return None
+            return compiled
+        except Exception as e:
+            logging.info(f'Compiled model unavailable: {e}')
+            return None
+
+    def _predict(self, model, scaled_data):
+        compiled = self.load_compiled_model()
+        if compiled is not None and (compiled.max_batch_rows is None or scaled_data.shape[0] <= compiled.max_batch_rows):
+            return compiled.predict(scaled_data)
+        return model.predict(scaled_data)
+
+    def _score(self, preprocessor, model, items):
+        compiled = self.load_compiled_preprocessor(model)
+        if compiled is not None:
+            scaled_data = compiled.transform_records([item.to_dict() for item in items])
+        else:
+            scaled_data = preprocessor.transform(CustomData.get_batch_as_dataframe(items))
+        return self._predict(model, scaled_data)
+
+    def predict_custom_data(self, items):
+        try:
+            preprocessor, model = self.load_artifacts()
+            if self.cache is None:
+                return self._score(preprocessor, model, items)
+
+            config = self.predict_pipeline_config
+            self.cache.set_version((
+                artifact_cache.version(self.preprocessor_paths(model)[0]),
+                artifact_cache.version(config.model_path)
+            ))
+            keys = [item.cache_key(config.cache_coordinate_decimals) for item in items]
+            predictions = np.empty(len(items), dtype=np.float64)
+            missing = {}
+            for i, key in enumerate(keys):
+                if key in missing:
+                    missing[key].append(i)
+                    continue
+                cached = self.cache.get(key)
+                if cached is None:
+                    missing[key] = [i]
+                else:
+                    predictions[i] = cached
+
+            if missing:
+                scored = self._score(preprocessor, model, [items[positions[0]] for positions in missing.values()])
+                for (key, positions), value in zip(missing.items(), scored):
+                    predictions[positions] = value
+                    self.cache.put(key, float(value))
+            return predictions
+        except Exception as e:
+            raise customexception(e, sys)
+
     def predict(self, features):
         try:
-            preprocessor_path = os.path.join("Artifacts", "Preprocessor.pkl")
-            model_path = os.path.join("Artifacts", "Model.pkl")
-            preprocessor = load_object(preprocessor_path)
-            model = load_object(model_path)
-            logging.info('Preprocessor and Model Pickle files loaded')
+            preprocessor, model = self.load_artifacts()
             scaled_data = preprocessor.transform(features)
             logging.info('Data Scaled')
-            pred = model.predict(scaled_data)
+            pred = self._predict(model, scaled_data)
             return pred
         except Exception as e:
             raise customexception(e, sys)
@@ -45,7 +296,8 @@ class CustomData:
                  number_of_reviews: int,
                  review_scores_rating: int,
                  bedrooms: int,
-                 beds: int):
+                 beds: int,
+                 amenity_list=None):
         
         self.property_type = property_type
         self.room_type = room_type
@@ -66,32 +318,60 @@ class CustomData:
         self.review_scores_rating = review_scores_rating
         self.bedrooms = bedrooms
         self.beds = beds
+        self.amenity_list = amenity_list
+
+    @classmethod
+    def from_record(cls, record):
+        if not isinstance(record, dict):
+            raise ValueError('listing must be a JSON object')
+
+        missing = [name for name in FEATURE_TYPES if record.get(name) in (None, '')]
+        if missing:
+            raise ValueError(f"missing fields: {', '.join(missing)}")
+
+        values = {}
+        for name, convert in FEATURE_TYPES.items():
+            try:
+                values[name] = convert(record[name])
+            except (TypeError, ValueError):
+                raise ValueError(f"invalid value for {name}: {record[name]!r}")
+        for name, convert in OPTIONAL_FEATURE_TYPES.items():
+            if record.get(name) is None:
+                continue
+            try:
+                values[name] = convert(record[name])
+            except (TypeError, ValueError):
+                raise ValueError(f"invalid value for {name}: {record[name]!r}")
+        return cls(**values)
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in (*FEATURE_TYPES, *OPTIONAL_FEATURE_TYPES)}
+
+    def cache_key(self, coordinate_decimals=None):
+        values = []
+        for name in (*FEATURE_TYPES, *OPTIONAL_FEATURE_TYPES):
+            value = getattr(self, name)
+            if coordinate_decimals is not None and name in ('latitude', 'longitude'):
+                value = round(float(value), coordinate_decimals)
+            elif isinstance(value, (int, float, np.number)) and not isinstance(value, bool):
+                value = float(value)
+            values.append(value)
+        return tuple(values)
+
+    @staticmethod
+    def get_batch_as_dataframe(items):
+        try:
+            df = pd.DataFrame.from_records([item.to_dict() for item in items], columns=[*FEATURE_TYPES, *OPTIONAL_FEATURE_TYPES])
+            logging.info(f'Batch Dataframe Gathered: {len(df)} rows')
+            return df
+        except Exception as e:
+            logging.info('Exception Occurred in prediction pipeline')
+            raise customexception(e, sys)
 
     def get_data_as_dataframe(self):
         try:
-            custom_data_input_dict = {
-                'property_type': [self.property_type],
-                'room_type': [self.room_type],
-                'amenities': [self.amenities],
-                'accommodates': [self.accommodates],
-                'bathrooms': [self.bathrooms],
-                'bed_type': [self.bed_type],
-                'cancellation_policy': [self.cancellation_policy],
-                'cleaning_fee': [self.cleaning_fee],
-                'city': [self.city],
-                'host_has_profile_pic': [self.host_has_profile_pic],
-                'host_identity_verified': [self.host_identity_verified],
-                'host_response_rate': [self.host_response_rate],
-                'instant_bookable': [self.instant_bookable],
-                'latitude': [self.latitude],
-                'longitude': [self.longitude],
-                'number_of_reviews': [self.number_of_reviews],
-                'review_scores_rating': [self.review_scores_rating],
-                'bedrooms': [self.bedrooms],
-                'beds': [self.beds]
-            }
+            custom_data_input_dict = {name: [value] for name, value in self.to_dict().items()}
             df = pd.DataFrame(custom_data_input_dict)
-            # df = np.reshape(df, (19,))
             logging.info('Dataframe Gathered')
             return df
         except Exception as e:
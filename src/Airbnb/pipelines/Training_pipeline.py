@@ -4,12 +4,13 @@ from src.Airbnb.components.Model_trainer import ModelTrainer
 
 # Data Ingestion Pipeline
 obj=DataIngestion()
-train_data_path,val_data_path,test_data_path=obj.initiate_data_ingestion()
+raw_data_path,split_index_path=obj.initiate_data_ingestion()
 
 # Data Transformation Pipeline
 data_transformation=DataTransformation()
-train_arr,val_arr,test_arr=data_transformation.initialize_data_transformation(train_data_path,val_data_path,test_data_path)
+train_arr,val_arr,test_arr=data_transformation.initialize_data_transformation(raw_data_path,split_index_path)
+native_arrays=data_transformation.load_native_arrays()
 
 # Model Training Pipeline
 model_trainer_obj=ModelTrainer()
-model_trainer_obj.initate_model_training(train_arr,val_arr,test_arr)
\ No newline at end of file
+model_trainer_obj.initate_model_training(train_arr,val_arr,test_arr,native_arrays,data_transformation.native_categorical_features())
\ No newline at end of file
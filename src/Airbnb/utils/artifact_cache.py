@@ -0,0 +1,112 @@
+import os
+import sys
+import time
+import threading
+import tracemalloc
+from functools import partial
+from dataclasses import dataclass
+from src.Airbnb.logger import logging
+from src.Airbnb.exception import customexception
+from src.Airbnb.utils.utils import load_object
+
+
+def _rss_bytes():
+    """Current resident set size of this process, or None where /proc is not available."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+@dataclass
+class CachedArtifact:
+    obj: object
+    version: tuple
+    load_seconds: float
+    memory_bytes: int
+    loaded_at: float
+
+
+class ArtifactCache:
+    """
+    Process-wide cache of unpickled artifacts.
+    An artifact is reloaded only when its file's mtime or size changes.
+    memory_bytes is the RSS growth across the load, including any modules the unpickling imports
+    (memory-mapped pages count once touched); size_bytes in stats() is the file's size on disk.
+    With trace_memory it is the bytes tracemalloc saw allocated instead: tracemalloc is
+    process-wide and slows every thread while it runs, so it is opt-in.
+    """
+
+    def __init__(self, loader=load_object, trace_memory=False):
+        self.loader = loader
+        self.trace_memory = trace_memory
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def file_version(file_path):
+        stat = os.stat(file_path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def get(self, file_path):
+        try:
+            version = self.file_version(file_path)
+            entry = self._entries.get(file_path)
+            if entry is not None and entry.version == version:
+                return entry.obj
+
+            with self._lock:
+                entry = self._entries.get(file_path)
+                if entry is None or entry.version != version:
+                    entry = self._load(file_path, version)
+                    self._entries[file_path] = entry
+            return entry.obj
+        except Exception as e:
+            logging.info(f'Exception occured while loading cached artifact {file_path}')
+            raise customexception(e, sys)
+
+    def version(self, file_path):
+        entry = self._entries.get(file_path)
+        return entry.version if entry is not None else None
+
+    def _load(self, file_path, version):
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if self.trace_memory and not tracing:
+            tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0] if self.trace_memory else _rss_bytes()
+        start = time.perf_counter()
+        try:
+            obj = self.loader(file_path)
+        finally:
+            load_seconds = time.perf_counter() - start
+            after = tracemalloc.get_traced_memory()[0] if self.trace_memory else _rss_bytes()
+            if self.trace_memory and not tracing:
+                tracemalloc.stop()
+
+        memory_bytes = max(after - before, 0) if before is not None and after is not None else None
+        memory = f'{memory_bytes / 1024 / 1024:.2f} MB' if memory_bytes is not None else 'unknown memory'
+        logging.info(f'Loaded {file_path} in {load_seconds * 1000:.1f} ms using {memory}')
+        return CachedArtifact(obj=obj, version=version, load_seconds=load_seconds,
+                              memory_bytes=memory_bytes, loaded_at=time.time())
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {
+            file_path: {
+                'mtime_ns': entry.version[0],
+                'size_bytes': entry.version[1],
+                'load_seconds': round(entry.load_seconds, 6),
+                'memory_bytes': entry.memory_bytes,
+                'loaded_at': entry.loaded_at
+            }
+            for file_path, entry in list(self._entries.items())
+        }
+
+
+# Numpy buffers are memory-mapped read-only so forked workers share them through the page cache.
+artifact_cache = ArtifactCache(loader=partial(load_object, mmap_mode='r'),
+                               trace_memory=os.environ.get("AIRBNB_TRACE_ARTIFACT_MEMORY", "0") == "1")
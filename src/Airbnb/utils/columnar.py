@@ -0,0 +1,171 @@
+import os
+import sys
+import json
+import shutil
+import numpy as np
+import pandas as pd
+from src.Airbnb.logger import logging
+from src.Airbnb.exception import customexception
+
+META_FILE = 'meta.json'
+
+
+class StringColumn:
+    """UTF-8 strings stored as one byte blob plus offsets; decodes only the rows that are read."""
+
+    def __init__(self, data, offsets, nulls=None):
+        self.data = data
+        self.offsets = offsets
+        self.nulls = nulls
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if self.nulls is not None and self.nulls[i]:
+            return None
+        return bytes(self.data[self.offsets[i]:self.offsets[i + 1]]).decode('utf-8')
+
+    def take(self, rows, null=None):
+        values = np.array([self[i] for i in rows], dtype=object)
+        if null is not None and self.nulls is not None:
+            values[np.asarray(self.nulls)[rows]] = null
+        return values
+
+    def to_numpy(self, null=None):
+        blob = self.data.tobytes()
+        bounds = self.offsets.tolist()
+        values = np.array([blob[bounds[i]:bounds[i + 1]].decode('utf-8') for i in range(len(self))], dtype=object)
+        if self.nulls is not None:
+            values[np.asarray(self.nulls)] = null
+        return values
+
+
+def _column_kind(values):
+    if isinstance(values, pd.Series):
+        values = values.array if isinstance(values.dtype, pd.CategoricalDtype) else values.to_numpy()
+    if isinstance(values, pd.Categorical):
+        return 'categorical', values
+    values = np.asarray(values)
+    if values.dtype.kind in 'biuf':
+        return 'numeric', values
+    return 'string', values.astype(object)
+
+
+def write_columnar(dir_path, columns, meta=None):
+    """
+    Write a dict of equal-length columns as one .npy file (set) per column.
+    Numeric columns are stored as-is, categoricals as int32 codes and strings as blob + offsets,
+    so every column can be memory-mapped on load. The directory is replaced atomically-ish.
+    """
+    try:
+        tmp_path = f'{dir_path}.tmp-{os.getpid()}'
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+
+        column_meta = {}
+        n_rows = None
+        for name, values in columns.items():
+            kind, values = _column_kind(values)
+            n_rows = len(values) if n_rows is None else n_rows
+            if len(values) != n_rows:
+                raise ValueError(f'column {name} has {len(values)} rows, expected {n_rows}')
+
+            info = {'kind': kind}
+            if kind == 'numeric':
+                np.save(os.path.join(tmp_path, f'{name}.npy'), np.ascontiguousarray(values))
+                info['dtype'] = values.dtype.str
+            elif kind == 'categorical':
+                np.save(os.path.join(tmp_path, f'{name}.codes.npy'), values.codes.astype(np.int32))
+                info['categories'] = values.categories.tolist()
+            else:
+                nulls = pd.isna(values)
+                encoded = [b'' if null else str(value).encode('utf-8') for value, null in zip(values, nulls)]
+                offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+                np.cumsum([len(chunk) for chunk in encoded], out=offsets[1:])
+                np.save(os.path.join(tmp_path, f'{name}.data.npy'), np.frombuffer(b''.join(encoded), dtype=np.uint8))
+                np.save(os.path.join(tmp_path, f'{name}.offsets.npy'), offsets)
+                info['has_nulls'] = bool(nulls.any())
+                if info['has_nulls']:
+                    np.save(os.path.join(tmp_path, f'{name}.nulls.npy'), nulls)
+            column_meta[name] = info
+
+        with open(os.path.join(tmp_path, META_FILE), 'w') as file_obj:
+            json.dump({'n_rows': n_rows or 0, 'columns': column_meta, **(meta or {})}, file_obj)
+
+        old_path = f'{dir_path}.old-{os.getpid()}'
+        if os.path.exists(dir_path):
+            os.replace(dir_path, old_path)
+        os.replace(tmp_path, dir_path)
+        shutil.rmtree(old_path, ignore_errors=True)
+        logging.info(f'Columnar store written to {dir_path}: {n_rows} rows, {len(column_meta)} columns')
+    except Exception as e:
+        logging.info(f'Exception occured while writing columnar store {dir_path}')
+        raise customexception(e, sys)
+
+
+class ColumnarStore:
+    """Read side of write_columnar; numeric arrays, category codes and string blobs are memory-mapped."""
+
+    def __init__(self, dir_path, mmap_mode='r'):
+        self.dir_path = dir_path
+        self.mmap_mode = mmap_mode
+        with open(os.path.join(dir_path, META_FILE)) as file_obj:
+            self.meta = json.load(file_obj)
+
+    @staticmethod
+    def exists(dir_path):
+        return os.path.exists(os.path.join(dir_path, META_FILE))
+
+    @property
+    def n_rows(self):
+        return self.meta['n_rows']
+
+    @property
+    def columns(self):
+        return list(self.meta['columns'])
+
+    def files(self):
+        return [os.path.join(self.dir_path, name) for name in sorted(os.listdir(self.dir_path))]
+
+    def _load(self, file_name):
+        return np.load(os.path.join(self.dir_path, file_name), mmap_mode=self.mmap_mode)
+
+    def column(self, name):
+        info = self.meta['columns'][name]
+        if info['kind'] == 'numeric':
+            return self._load(f'{name}.npy')
+        if info['kind'] == 'categorical':
+            return pd.Categorical.from_codes(self._load(f'{name}.codes.npy'), categories=info['categories'])
+        nulls = self._load(f'{name}.nulls.npy') if info.get('has_nulls') else None
+        return StringColumn(self._load(f'{name}.data.npy'), self._load(f'{name}.offsets.npy'), nulls)
+
+    def take(self, name, rows=None):
+        column = self.column(name)
+        if isinstance(column, StringColumn):
+            return column.to_numpy() if rows is None else column.take(rows)
+        if rows is None:
+            return np.asarray(column) if not isinstance(column, pd.Categorical) else column
+        return column[rows]
+
+    def to_frame(self, columns=None, rows=None):
+        """
+        Selected columns (missing ones are skipped) and rows as a plain DataFrame, the way read_csv
+        would return them: categoricals and strings come back as object arrays with NaN for nulls.
+        """
+        try:
+            columns = self.columns if columns is None else [name for name in columns if name in self.meta['columns']]
+            frame = {}
+            for name in columns:
+                column = self.column(name)
+                if isinstance(column, StringColumn):
+                    frame[name] = column.to_numpy(null=np.nan) if rows is None else column.take(rows, null=np.nan)
+                elif isinstance(column, pd.Categorical):
+                    column = column if rows is None else column[rows]
+                    frame[name] = np.asarray(column.astype(object))
+                else:
+                    frame[name] = np.asarray(column if rows is None else column[rows])
+            return pd.DataFrame(frame)
+        except Exception as e:
+            logging.info(f'Exception occured while reading columnar store {self.dir_path}')
+            raise customexception(e, sys)
@@ -0,0 +1,114 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import numpy as np
+from scipy import sparse
+from dataclasses import dataclass
+from src.Airbnb.logger import logging
+from src.Airbnb.exception import customexception
+from src.Airbnb.utils.utils import file_digest
+
+
+@dataclass
+class StageCacheConfig:
+    manifest_dir = os.path.join('Artifacts', 'manifests')
+    enabled = os.environ.get('AIRBNB_STAGE_CACHE', '1') == '1'
+
+
+class StageCache:
+    """
+    Content-addressed manifests for the training stages (Artifacts/manifests/{stage}.json).
+
+    A stage's key hashes its input files, its config and the source of the modules it runs.
+    A rerun can skip the stage when the stored key matches and its recorded outputs are intact.
+    File digests are memoized by (mtime_ns, size), so unchanged files are not re-hashed.
+    """
+
+    DIGESTS_FILE = '_digests.json'
+
+    def __init__(self, manifest_dir=None, enabled=None):
+        config = StageCacheConfig()
+        self.manifest_dir = manifest_dir or config.manifest_dir
+        self.enabled = config.enabled if enabled is None else enabled
+        self._digests = self._read_json(os.path.join(self.manifest_dir, self.DIGESTS_FILE)) or {}
+
+    @staticmethod
+    def _read_json(path):
+        try:
+            with open(path) as file_obj:
+                return json.load(file_obj)
+        except (OSError, ValueError):
+            return None
+
+    def _write_json(self, path, data):
+        os.makedirs(self.manifest_dir, exist_ok=True)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as file_obj:
+            json.dump(data, file_obj, indent=2, sort_keys=True, default=str)
+        os.replace(tmp_path, path)
+
+    def digest(self, file_path):
+        stat = os.stat(file_path)
+        key = os.path.abspath(file_path)
+        memo = self._digests.get(key)
+        if memo is not None and memo[:2] == [stat.st_mtime_ns, stat.st_size]:
+            return memo[2]
+        digest = file_digest(file_path)
+        self._digests[key] = [stat.st_mtime_ns, stat.st_size, digest]
+        return digest
+
+    @staticmethod
+    def array_digest(array):
+        if sparse.issparse(array):
+            array = sparse.csr_matrix(array)
+            parts = [StageCache.array_digest(part) for part in (array.data, array.indices, array.indptr)]
+            return hashlib.sha256(f'csr{array.shape}{parts}'.encode()).hexdigest()
+        array = np.ascontiguousarray(array)
+        digest = hashlib.sha256(f'{array.dtype.str}{array.shape}'.encode())
+        digest.update(memoryview(array).cast('B'))
+        return digest.hexdigest()
+
+    def fingerprint(self, inputs, config, modules, arrays=None):
+        """`modules` are the module objects whose source defines the stage; `arrays` are in-memory inputs."""
+        fingerprint = {
+            'inputs': {path: self.digest(path) for path in inputs},
+            'arrays': [self.array_digest(array) for array in (arrays or [])],
+            'config': json.loads(json.dumps(config, sort_keys=True, default=str)),
+            'code': {module.__name__: self.digest(module.__file__) for module in modules}
+        }
+        fingerprint['key'] = hashlib.sha256(json.dumps(fingerprint, sort_keys=True).encode()).hexdigest()
+        return fingerprint
+
+    def manifest_path(self, stage):
+        return os.path.join(self.manifest_dir, f'{stage}.json')
+
+    def is_fresh(self, stage, fingerprint):
+        if not self.enabled:
+            return False
+        try:
+            manifest = self._read_json(self.manifest_path(stage))
+            if manifest is None or manifest.get('key') != fingerprint['key']:
+                return False
+            for path, digest in manifest['outputs'].items():
+                if not os.path.exists(path) or self.digest(path) != digest:
+                    logging.info(f'Stage {stage}: output {path} is missing or changed')
+                    return False
+            logging.info(f'Stage {stage}: manifest matches, reusing outputs')
+            return True
+        except Exception as e:
+            raise customexception(e, sys)
+
+    def record(self, stage, fingerprint, outputs, seconds=None):
+        try:
+            manifest = dict(fingerprint)
+            manifest['stage'] = stage
+            manifest['outputs'] = {path: self.digest(path) for path in outputs}
+            manifest['seconds'] = seconds
+            manifest['created_at'] = time.time()
+            self._write_json(self.manifest_path(stage), manifest)
+            self._write_json(os.path.join(self.manifest_dir, self.DIGESTS_FILE), self._digests)
+            logging.info(f'Stage {stage}: manifest written ({fingerprint["key"][:12]})')
+        except Exception as e:
+            raise customexception(e, sys)
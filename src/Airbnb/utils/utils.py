@@ -1,55 +1,160 @@
 import os
 import sys
-import pickle
+import time
+import hashlib
+import joblib
 import numpy as np
 import pandas as pd
+from scipy import sparse
 from src.Airbnb.logger import logging
 from src.Airbnb.exception import customexception
 from sklearn.metrics import r2_score, mean_absolute_error,mean_squared_error
 
+def _replace_file(file_path, write):
+    # Artifacts are memory-mapped by live workers, and rewriting one in place would truncate pages
+    # they still map (SIGBUS). write() fills a temp file in the same directory that is then renamed
+    # over file_path, so existing mappings keep the old inode.
+    tmp_path = f"{file_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as file_obj:
+            write(file_obj)
+        os.replace(tmp_path, file_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
 def save_object(file_path, obj):
+    # joblib writes numpy buffers uncompressed and aligned inside the file,
+    # so load_object(..., mmap_mode='r') can map them instead of copying.
     try:
         dir_path = os.path.dirname(file_path)
         os.makedirs(dir_path, exist_ok=True)
-        with open(file_path, "wb") as file_obj:
-            pickle.dump(obj, file_obj)
+        _replace_file(file_path, lambda file_obj: joblib.dump(obj, file_obj))
+    except Exception as e:
+        raise customexception(e, sys)
+
+
+def save_matrix(file_path, matrix):
+    """Saves a dense array as <file_path>.npy or a scipy.sparse matrix as <file_path>.npz; returns the path written."""
+    try:
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        dense_path, sparse_path = f"{file_path}.npy", f"{file_path}.npz"
+        if sparse.issparse(matrix):
+            _replace_file(sparse_path, lambda file_obj: sparse.save_npz(file_obj, sparse.csr_matrix(matrix), compressed=False))
+            written, stale = sparse_path, dense_path
+        else:
+            _replace_file(dense_path, lambda file_obj: np.save(file_obj, matrix))
+            written, stale = dense_path, sparse_path
+        if os.path.exists(stale):
+            os.remove(stale)
+        return written
+    except Exception as e:
+        raise customexception(e, sys)
+
+
+def load_matrix(file_path, mmap_mode=None):
+    try:
+        if os.path.exists(f"{file_path}.npz"):
+            return sparse.load_npz(f"{file_path}.npz").tocsr()
+        return np.load(f"{file_path}.npy", mmap_mode=mmap_mode)
+    except Exception as e:
+        raise customexception(e, sys)
+
+
+def file_digest(file_path, chunk_size=1024 * 1024):
+    try:
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as file_obj:
+            for chunk in iter(lambda: file_obj.read(chunk_size), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
     except Exception as e:
         raise customexception(e, sys)
     
 
-from sklearn.model_selection import cross_val_score, GridSearchCV
-from sklearn.metrics import r2_score, mean_squared_error
-import numpy as np
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.model_selection import GridSearchCV, HalvingGridSearchCV, KFold, ParameterGrid
+from joblib import Parallel, delayed
 
-def evaluate_model(X_train,y_train,X_test,y_test,models,params=None):
+
+def _search_model(name, model, para, X_train, y_train, X_test, y_test, cv, n_jobs, search='grid', halving=None):
+    """Grid search on the shared folds; GridSearchCV's refit is the only fit on the full training set."""
+    start = time.perf_counter()
+    n_candidates = len(ParameterGrid(para or {}))
+    halving = dict(halving or {})
+    factor = halving.get('factor', 3)
+    if search == 'halving' and n_candidates > factor:
+        # Successive halving on training-row subsamples: each round keeps the best 1/factor of the
+        # configs and gives them factor times more rows, up to max_resources rows in the last round.
+        gs = HalvingGridSearchCV(model, para, cv=cv, scoring='r2', n_jobs=n_jobs, refit=True, factor=factor,
+                                 resource='n_samples', max_resources=halving.get('max_resources') or 'auto',
+                                 min_resources=halving.get('min_resources') or 'exhaust', random_state=42)
+        gs.fit(X_train, y_train)
+        # Budget in rows fitted per fold, summed over rounds and candidates.
+        budget = sum(int(c) * int(r) for c, r in zip(gs.n_candidates_, gs.n_resources_))
+    else:
+        gs = GridSearchCV(model, para or {}, cv=cv, scoring='r2', n_jobs=n_jobs, refit=True)
+        gs.fit(X_train, y_train)
+        budget = n_candidates * X_train.shape[0]
+    n_kept = int(np.sum(gs.cv_results_['iter'] == gs.cv_results_['iter'].max())) if 'iter' in gs.cv_results_ else n_candidates
+
+    y_test_pred = gs.best_estimator_.predict(X_test)
+    return {
+        'name': name,
+        'estimator': gs.best_estimator_,
+        'best_params': gs.best_params_,
+        'cv_score': gs.best_score_,
+        'test_score': r2_score(y_test, y_test_pred),
+        'rmse': np.sqrt(mean_squared_error(y_test, y_test_pred)),
+        'n_candidates': n_candidates,
+        'pruned': n_candidates - n_kept,
+        'budget': budget,
+        'grid_budget': n_candidates * X_train.shape[0],
+        'seconds': time.perf_counter() - start
+    }
+
+
+def evaluate_model(X_train,y_train,X_test,y_test,models,params=None,cv=None,n_jobs=None,search='grid',halving=None):
+    """
+    Searches every model on one shared set of CV folds and reports the best mean CV R2 per model.
+    Models are searched in parallel, largest grids first, within a budget of n_jobs cores
+    (all cores by default); each fitted best estimator is written back into `models`.
+    search='halving' runs successive halving (HalvingGridSearchCV options in `halving`:
+    factor, min_resources, max_resources) on grids with more candidates than the factor.
+    """
     try:
+        cv = cv if cv is not None else KFold(n_splits=3, shuffle=True, random_state=42)
+        budget = (os.cpu_count() or 1) if n_jobs in (None, -1) else max(1, n_jobs)
+        names = sorted(models, key=lambda name: -len(ParameterGrid((params or {}).get(name) or {})))
+        outer = min(len(names), budget)
+        inner = max(1, budget // outer)
+        logging.info(f"Searching {len(names)} models on {budget} cores ({outer} in parallel x {inner} jobs each)")
+
+        tasks = [
+            delayed(_search_model)(name, models[name], (params or {}).get(name), X_train, y_train, X_test, y_test,
+                                   cv, inner, search, halving)
+            for name in names
+        ]
+        # n_jobs=1 runs the searches in this process without starting a pool.
+        results = Parallel(n_jobs=outer)(tasks)
+
         report = {}
-        for i in range(len(models)):
-            model = list(models.values())[i]
-            para = params[list(models.keys())[i]] if params else {}
-
-            if para:
-                gs = GridSearchCV(model, para, cv=3, n_jobs=-1, verbose=1)
-                gs.fit(X_train,y_train)
-                model.set_params(**gs.best_params_)
-                logging.info(f"Best Params for {list(models.keys())[i]}: {gs.best_params_}")
-
-            model.fit(X_train,y_train)
-            
-            cv_scores = cross_val_score(model, X_train, y_train, cv=5, scoring='r2')
-            cv_mean_score = np.mean(cv_scores)
-
-            y_test_pred =model.predict(X_test)
-            
-            test_model_score = r2_score(y_test,y_test_pred)
-            rmse = np.sqrt(mean_squared_error(y_test, y_test_pred))
-
-            logging.info(f"Model: {list(models.keys())[i]}")
-            logging.info(f"   - CV Score (R2): {cv_mean_score:.4f}")
-            logging.info(f"   - Test Score (R2): {test_model_score:.4f}")
-            logging.info(f"   - RMSE: {rmse:.4f}")
-            
-            report[list(models.keys())[i]] = cv_mean_score
+        spent = sum(result['budget'] for result in results)
+        exhaustive = sum(result['grid_budget'] for result in results)
+        logging.info(f"Search budget ({search}): {spent} row-fits per fold, {spent / max(exhaustive, 1):.1%} of the exhaustive grid; "
+                     f"{sum(result['pruned'] for result in results)} of {sum(result['n_candidates'] for result in results)} configs pruned")
+        by_name = {result['name']: result for result in results}
+        for name in models:
+            result = by_name[name]
+            models[name] = result['estimator']
+            logging.info(f"Model: {name} ({result['n_candidates']} candidates, {result['pruned']} pruned, "
+                         f"{result['budget']} row-fits per fold, {result['seconds']:.1f}s)")
+            logging.info(f"   - Best Params: {result['best_params']}")
+            logging.info(f"   - CV Score (R2): {result['cv_score']:.4f}")
+            logging.info(f"   - Test Score (R2): {result['test_score']:.4f}")
+            logging.info(f"   - RMSE: {result['rmse']:.4f}")
+            report[name] = result['cv_score']
 
         return report
     except Exception as e:
@@ -57,10 +162,10 @@ def evaluate_model(X_train,y_train,X_test,y_test,models,params=None):
         raise customexception(e,sys)
     
     
-def load_object(file_path):
+def load_object(file_path, mmap_mode=None):
+    # joblib.load also reads artifacts written with plain pickle.dump.
     try:
-        with open(file_path,'rb') as file_obj:
-            return pickle.load(file_obj)
+        return joblib.load(file_path, mmap_mode=mmap_mode)
     except Exception as e:
         logging.info('Exception Occured in load_object function utils')
         raise customexception(e,sys)
\ No newline at end of file
@@ -0,0 +1,78 @@
+import time
+import threading
+from src.Airbnb.logger import logging
+
+
+class SkipStep(Exception):
+    """Raised by an optional step whose input is absent; the step is reported as skipped, not failed."""
+
+
+class Warmup:
+    """
+    Runs named start-up steps in order, either inline (run) or in a background thread (start),
+    and records each step's state and timing for the readiness endpoint. Skipped steps do not
+    make the service unready.
+    """
+
+    def __init__(self, steps):
+        self.steps = list(steps)
+        self.components = {
+            name: {'state': 'pending', 'seconds': None, 'error': None, 'detail': None}
+            for name, _ in self.steps
+        }
+        self.started_at = None
+        self.finished_at = None
+        self._done = threading.Event()
+
+    def run(self):
+        self.started_at = time.time()
+        try:
+            for name, step in self.steps:
+                component = self.components[name]
+                component['state'] = 'running'
+                start = time.perf_counter()
+                try:
+                    step()
+                    component['state'] = 'ready'
+                except SkipStep as e:
+                    component['state'] = 'skipped'
+                    component['detail'] = str(e)
+                    logging.info(f'Warm-up step {name} skipped: {e}')
+                except Exception as e:
+                    component['state'] = 'failed'
+                    component['error'] = str(e)
+                    logging.info(f'Warm-up step {name} failed: {e}')
+                finally:
+                    component['seconds'] = round(time.perf_counter() - start, 6)
+                    logging.info(f"Warm-up step {name}: {component['state']} in {component['seconds']:.3f} s")
+        finally:
+            self.finished_at = time.time()
+            self._done.set()
+
+    def start(self):
+        thread = threading.Thread(target=self.run, name='warmup', daemon=True)
+        thread.start()
+        return thread
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    @property
+    def ready(self):
+        return self.done and all(component['state'] in ('ready', 'skipped') for component in self.components.values())
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def report(self):
+        if not self.done:
+            status = 'warming'
+        else:
+            status = 'ready' if self.ready else 'degraded'
+        return {
+            'status': status,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'components': {name: dict(component) for name, component in self.components.items()}
+        }
@@ -2,16 +2,54 @@ import os
 import requests
 import pandas as pd
 import numpy as np
-import io
 import gzip
+import json
 import time
-import random
+import zlib
+import shutil
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+
+
+class HostLimiter:
+    """
+    Per-host politeness: at most `max_per_host` concurrent requests to a host, and request
+    starts to the same host spaced at least `min_interval` seconds apart.
+    """
+
+    def __init__(self, max_per_host=2, min_interval=1.0):
+        self.max_per_host = max_per_host
+        self.min_interval = min_interval
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _host(self, host):
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = {'slots': threading.Semaphore(self.max_per_host),
+                                     'lock': threading.Lock(), 'next_start': 0.0}
+            return self._hosts[host]
+
+    @contextmanager
+    def slot(self, url):
+        state = self._host(urlsplit(url).netloc)
+        with state['slots']:
+            with state['lock']:
+                wait = state['next_start'] - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+                state['next_start'] = time.monotonic() + self.min_interval
+            yield
 
 class AirbnbDataDownloader:
     """
     Smart Downloader with FALLBACK Strategy.
     Priority: Dec 2025 (Q4) -> Sept 2025 (Q3) -> June 2025 (Q2) -> March 2025 (Q1).
     Attempts to get the LATEST available data for each city.
+    Cities are fetched concurrently under per-host politeness limits; interrupted downloads are
+    resumed, unchanged files are revalidated with ETag/Last-Modified, and every file is gzip-checked.
     """
     
     # Prioritized List of URLs (Newest to Oldest)
@@ -45,100 +83,257 @@ class AirbnbDataDownloader:
         ]
     }
 
-    def __init__(self, output_dir="Artifacts"):
+    # Columns read by the training pipeline and the web app; everything else is dropped while streaming.
+    KEEP_COLUMNS = [
+        'id', 'name', 'neighbourhood', 'property_type', 'room_type', 'amenities', 'accommodates',
+        'bathrooms', 'bed_type', 'cancellation_policy', 'cleaning_fee', 'host_has_profile_pic',
+        'host_identity_verified', 'host_response_rate', 'instant_bookable', 'latitude', 'longitude',
+        'number_of_reviews', 'review_scores_rating', 'bedrooms', 'beds', 'price'
+    ]
+
+    HEADERS = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36',
+        'Referer': 'http://insideairbnb.com/get-the-data/',
+    }
+    CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, output_dir="Artifacts", max_per_host=2, min_interval=1.0, retries=3, backoff=2.0, timeout=90):
         self.output_dir = output_dir
         self.raw_dir = os.path.join(output_dir, "Raw_Smart_Download")
+        self.partition_dir = os.path.join(output_dir, "Listings_By_City")
+        self.limiter = HostLimiter(max_per_host=max_per_host, min_interval=min_interval)
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self._local = threading.local()
         os.makedirs(self.raw_dir, exist_ok=True)
 
-    def download_data(self):
-        print("[START] starting Smart Fallback Download...")
-        downloaded_files = []
-        
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36',
-            'Referer': 'http://insideairbnb.com/get-the-data/',
-        }
-        session = requests.Session()
-        session.headers.update(headers)
-
-        for city, candidates in self.CITY_CANDIDATES.items():
-            print(f"\n[PROCESSING] {city} (Trying {len(candidates)} candidates)...")
-            success = False
-            
-            for period, url in candidates:
-                filename = f"{city}_{period}_listings.csv.gz"
-                filepath = os.path.join(self.raw_dir, filename)
-                
-                # Setup: Check if already exists valid
-                if os.path.exists(filepath) and os.path.getsize(filepath) > 500*1024:
-                     print(f"   [FOUND] {period} already exists. Using it.")
-                     downloaded_files.append((city, filepath))
-                     success = True
-                     break
-                
-                print(f"   [TRYING] {period}...")
-                try:
-                    time.sleep(random.uniform(3, 7)) # Polite delay
-                    r = session.get(url, stream=True, timeout=90)
-                    
-                    if r.status_code == 200:
-                        with open(filepath, 'wb') as f:
-                            for chunk in r.iter_content(chunk_size=8192):
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(self.HEADERS)
+            self._local.session = session
+        return session
+
+    @staticmethod
+    def _read_meta(filepath):
+        try:
+            with open(filepath + ".meta.json") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _write_meta(filepath, meta):
+        with open(filepath + ".meta.json", 'w') as f:
+            json.dump(meta, f)
+
+    @staticmethod
+    def gzip_ok(filepath):
+        """True if the file decompresses to EOF with a valid CRC (catches truncated downloads)."""
+        try:
+            with gzip.open(filepath, 'rb') as f:
+                while f.read(1024 * 1024):
+                    pass
+            return True
+        except (OSError, EOFError, zlib.error):
+            return False
+
+    def _verified(self, filepath, meta):
+        """A complete local file is trusted if it passed the gzip check at its current mtime/size."""
+        if not os.path.exists(filepath):
+            return False
+        stat = os.stat(filepath)
+        if meta.get('verified') == [stat.st_mtime_ns, stat.st_size]:
+            return True
+        if self.gzip_ok(filepath):
+            meta['verified'] = [stat.st_mtime_ns, stat.st_size]
+            self._write_meta(filepath, meta)
+            return True
+        os.remove(filepath)
+        return False
+
+    def _fetch(self, url, filepath):
+        """
+        Returns 'downloaded', 'unchanged', 'stale' (revalidation failed, local copy kept) or a failure label.
+        Complete files are revalidated with If-None-Match/If-Modified-Since; partial downloads
+        are kept in `<file>.part` and resumed with Range/If-Range.
+        """
+        part_path = filepath + ".part"
+        meta = self._read_meta(filepath)
+        have_file = self._verified(filepath, meta)
+
+        for attempt in range(self.retries):
+            headers = {}
+            offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            if offset:
+                headers['Range'] = f"bytes={offset}-"
+                if meta.get('part_validator'):
+                    headers['If-Range'] = meta['part_validator']
+            elif have_file:
+                if meta.get('etag'):
+                    headers['If-None-Match'] = meta['etag']
+                if meta.get('last_modified'):
+                    headers['If-Modified-Since'] = meta['last_modified']
+
+            try:
+                with self.limiter.slot(url):
+                    r = self._session().get(url, headers=headers, stream=True, timeout=self.timeout)
+                    with r:
+                        if r.status_code == 304:
+                            return 'unchanged'
+                        if r.status_code in (403, 404):
+                            if have_file:
+                                return 'stale'
+                            return 'blocked' if r.status_code == 403 else 'missing'
+                        if r.status_code == 416:
+                            # Range past the end: the .part is already complete (or bogus).
+                            if self.gzip_ok(part_path):
+                                return self._finish(part_path, filepath, meta)
+                            if os.path.exists(part_path):
+                                os.remove(part_path)
+                            continue
+                        if r.status_code not in (200, 206):
+                            raise IOError(f"status {r.status_code}")
+
+                        resumed = r.status_code == 206 and offset > 0
+                        meta['etag'] = r.headers.get('ETag')
+                        meta['last_modified'] = r.headers.get('Last-Modified')
+                        meta['part_validator'] = meta['etag'] or meta['last_modified']
+                        self._write_meta(filepath, meta)
+                        expected = r.headers.get('Content-Length')
+
+                        received = 0
+                        with open(part_path, 'ab' if resumed else 'wb') as f:
+                            for chunk in r.iter_content(chunk_size=self.CHUNK_SIZE):
                                 f.write(chunk)
-                        print(f"   [SUCCESS] Downloaded {period}!")
-                        downloaded_files.append((city, filepath))
-                        success = True
-                        break # Stop looking for older dates
-                    elif r.status_code == 403:
-                        print(f"   [BLOCKED] 403 Forbidden for {period}.")
-                    elif r.status_code == 404:
-                        print(f"   [MISSING] 404 Not Found for {period}.")
-                    else:
-                        print(f"   [FAIL] Status {r.status_code}")
-                        
-                except Exception as e:
-                    print(f"   [ERROR] Exception: {e}")
-            
-            if not success:
-                print(f"   [GAVE UP] Could not download any data for {city}.")
+                                received += len(chunk)
+                        if expected is not None and received < int(expected):
+                            raise IOError(f"truncated: {received} of {expected} bytes")
+
+                if self.gzip_ok(part_path):
+                    return self._finish(part_path, filepath, meta)
+                print(f"   [CORRUPT] {os.path.basename(filepath)} failed the gzip check, restarting")
+                os.remove(part_path)
+            except Exception as e:
+                print(f"   [RETRY {attempt + 1}/{self.retries}] {os.path.basename(filepath)}: {e}")
+                time.sleep(self.backoff * 2 ** attempt)
+
+        return 'stale' if have_file else 'failed'
 
+    def _finish(self, part_path, filepath, meta):
+        os.replace(part_path, filepath)
+        stat = os.stat(filepath)
+        meta['verified'] = [stat.st_mtime_ns, stat.st_size]
+        meta.pop('part_validator', None)
+        self._write_meta(filepath, meta)
+        return 'downloaded'
+
+    def _download_city(self, city, candidates):
+        print(f"[PROCESSING] {city} (Trying {len(candidates)} candidates)...")
+        for period, url in candidates:
+            filepath = os.path.join(self.raw_dir, f"{city}_{period}_listings.csv.gz")
+            status = self._fetch(url, filepath)
+            print(f"   [{status.upper()}] {city} {period}")
+            if status in ('downloaded', 'unchanged', 'stale'):
+                return filepath  # Stop looking for older dates
+        print(f"   [GAVE UP] Could not download any data for {city}.")
+        return None
+
+    def download_data(self, max_workers=5):
+        print("[START] starting Smart Fallback Download...")
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {city: pool.submit(self._download_city, city, candidates)
+                       for city, candidates in self.CITY_CANDIDATES.items()}
+        downloaded_files = []
+        for city, future in futures.items():
+            filepath = future.result()
+            if filepath is not None:
+                downloaded_files.append((city, filepath))
         return downloaded_files
 
-    def process_and_merge(self, files):
+    def _output_columns(self, files):
+        """KEEP_COLUMNS present in at least one input file, plus city and log_price."""
+        present = set()
+        for _, filepath in files:
+            try:
+                present.update(pd.read_csv(filepath, compression='gzip', nrows=0).columns)
+            except Exception as e:
+                print(f"   Error reading header of {filepath}: {e}")
+        return [col for col in self.KEEP_COLUMNS if col in present] + ['city', 'log_price']
+
+    def _clean_chunk(self, chunk, city, columns):
+        chunk['price'] = pd.to_numeric(
+            chunk['price'].astype(str).str.replace('$', '', regex=False).str.replace(',', '', regex=False),
+            errors='coerce'
+        )
+        chunk = chunk[chunk['price'] > 0].copy()
+        chunk['log_price'] = np.log(chunk['price'])
+        chunk['city'] = city
+        return chunk.reindex(columns=columns)
+
+    def process_and_merge(self, files, chunksize=50000):
+        """
+        Streams each city's gzip in chunks of `chunksize` rows, keeping only KEEP_COLUMNS, and
+        writes one CSV partition per city; the partitions are then concatenated into
+        New_Airbnb_Data.csv. Peak memory is bounded by the chunk size, not the dataset.
+        """
         print("\n[MERGING] Constructing Final Dataset...")
-        dfs = []
-        
+        columns = self._output_columns(files)
+        if 'price' not in columns:
+            print("No data to merge.")
+            return
+
+        os.makedirs(self.partition_dir, exist_ok=True)
+        partitions = []
+        total_rows = 0
+        start = time.perf_counter()
+
         for city, filepath in files:
-            print(f"   Reading {city} from {os.path.basename(filepath)}...")
+            print(f"   Streaming {city} from {os.path.basename(filepath)}...")
+            partition_path = os.path.join(self.partition_dir, f"{city}.csv")
+            tmp_path = partition_path + ".tmp"
+            city_start = time.perf_counter()
+            raw_rows = kept_rows = 0
             try:
-                df = pd.read_csv(filepath, compression='gzip', low_memory=False, dtype={'price': str}, on_bad_lines='skip')
-                df['city'] = city
-                dfs.append(df)
+                reader = pd.read_csv(filepath, compression='gzip', chunksize=chunksize, dtype={'price': str},
+                                     usecols=lambda col: col in self.KEEP_COLUMNS, on_bad_lines='skip')
+                with open(tmp_path, 'w', newline='') as f:
+                    f.write(','.join(columns) + '\n')
+                    for chunk in reader:
+                        raw_rows += len(chunk)
+                        chunk = self._clean_chunk(chunk, city, columns)
+                        kept_rows += len(chunk)
+                        chunk.to_csv(f, header=False, index=False)
+                os.replace(tmp_path, partition_path)
             except Exception as e:
                 print(f"   Error reading {filepath}: {e}")
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                continue
 
-        if not dfs:
+            elapsed = time.perf_counter() - city_start
+            print(f"   {city}: {kept_rows}/{raw_rows} rows kept in {elapsed:.1f}s ({raw_rows / max(elapsed, 1e-9):,.0f} rows/s)")
+            partitions.append(partition_path)
+            total_rows += kept_rows
+
+        if not partitions:
             print("No data to merge.")
             return
 
-        full_df = pd.concat(dfs, ignore_index=True)
-        print(f"   Merged Raw Rows: {len(full_df)}")
-
-        # --- PRE-PROCESSING ---
-        print("   Cleaning 'price' column...")
-        if 'price' in full_df.columns:
-            full_df['price'] = full_df['price'].astype(str).str.replace('$', '', regex=False).str.replace(',', '', regex=False)
-            full_df['price'] = pd.to_numeric(full_df['price'], errors='coerce')
-        
-        print("   Creating 'log_price' target...")
-        full_df = full_df.dropna(subset=['price'])
-        full_df = full_df[full_df['price'] > 0]
-        full_df['log_price'] = np.log(full_df['price'])
-        
         output_path = os.path.join(self.output_dir, "New_Airbnb_Data.csv")
-        full_df.to_csv(output_path, index=False)
-        print(f"\n[COMPLETE] Final Dataset: {len(full_df)} rows.")
-        print(f"Saved to: {output_path}")
+        with open(output_path + ".tmp", 'wb') as out:
+            for i, partition_path in enumerate(partitions):
+                with open(partition_path, 'rb') as f:
+                    if i > 0:
+                        f.readline()  # header
+                    shutil.copyfileobj(f, out, 1024 * 1024)
+        os.replace(output_path + ".tmp", output_path)
+
+        elapsed = time.perf_counter() - start
+        print(f"\n[COMPLETE] Final Dataset: {total_rows} rows in {elapsed:.1f}s ({total_rows / max(elapsed, 1e-9):,.0f} rows/s).")
+        print(f"Saved to: {output_path} (per-city partitions in {self.partition_dir})")
 
 if __name__ == "__main__":
     downloader = AirbnbDataDownloader()
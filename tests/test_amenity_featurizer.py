@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.compose import ColumnTransformer
+
+from src.Airbnb.components.Amenity_featurizer import AmenityFeaturizer
+from src.Airbnb.components.Compiled_preprocessor import CompiledPreprocessor, VECTORIZE_MIN_ROWS
+
+TRAIN = ['{"Wifi","TV"}', '{"Wifi"}', '["Wifi", "Kitchen"]', '{}', np.nan]
+
+
+def test_only_missing_lists_get_the_training_frequencies():
+    featurizer = AmenityFeaturizer(top_k=3).fit(pd.Series(TRAIN))
+    assert featurizer.vocabulary_ == ['wifi', 'kitchen', 'tv']
+    # Shares of the four listings that report a list, the empty one included.
+    np.testing.assert_allclose(featurizer.frequencies_, [0.75, 0.25, 0.25])
+
+    encoded = featurizer.transform(pd.Series(['{}', '[]', (), np.nan, None, '', '{"TV"}'], dtype=object)).toarray()
+    np.testing.assert_array_equal(encoded[:3], 0.0)
+    np.testing.assert_allclose(encoded[3:6], np.tile(featurizer.frequencies_, (3, 1)))
+    np.testing.assert_array_equal(encoded[6], [0.0, 0.0, 1.0])
+
+
+@pytest.mark.parametrize('n_rows', [7, VECTORIZE_MIN_ROWS * 2])
+def test_compiled_encoder_matches_featurizer(n_rows):
+    preprocessor = ColumnTransformer([('amenity_pipeline', AmenityFeaturizer(top_k=3), ['amenity_list'])],
+                                     sparse_threshold=0)
+    preprocessor.fit(pd.DataFrame({'amenity_list': TRAIN}))
+    compiled = CompiledPreprocessor.from_column_transformer(preprocessor)
+
+    values = ['{}', '[]', (), np.nan, None, '', '{"TV","Wifi"}']
+    df = pd.DataFrame({'amenity_list': [values[i % len(values)] for i in range(n_rows)]})
+    expected = preprocessor.transform(df)
+    np.testing.assert_allclose(compiled.transform(df), expected)
+    np.testing.assert_allclose(compiled.transform_records(df.to_dict('records')), expected)
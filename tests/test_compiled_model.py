@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import GradientBoostingRegressor
+from sklearn.linear_model import Ridge
+
+from src.Airbnb.components.Compiled_model import CompiledTreeEnsemble, NotCompilableError, export_compiled_model
+
+rng = np.random.default_rng(0)
+X = rng.normal(size=(300, 5))
+y = X[:, 0] * 2 + X[:, 1] ** 2 + rng.normal(scale=0.1, size=300)
+
+
+@pytest.mark.parametrize('init', [None, 'zero'])
+def test_gradient_boosting_is_compiled(init):
+    model = GradientBoostingRegressor(n_estimators=20, init=init, random_state=0).fit(X, y)
+    compiled = CompiledTreeEnsemble.from_model(model)
+    np.testing.assert_allclose(compiled.predict(X), model.predict(X), atol=1e-9)
+
+
+def test_gradient_boosting_with_init_estimator_is_not_compiled(tmp_path):
+    model = GradientBoostingRegressor(n_estimators=20, init=Ridge(), random_state=0).fit(X, y)
+    with pytest.raises(NotCompilableError):
+        CompiledTreeEnsemble.from_model(model)
+
+    model_path, compiled_path = tmp_path / 'model.pkl', tmp_path / 'compiled_model.pkl'
+    model_path.write_bytes(b'model')
+    compiled_path.write_bytes(b'stale')
+    assert export_compiled_model(str(model_path), str(compiled_path), model, X) is None
+    assert not compiled_path.exists()
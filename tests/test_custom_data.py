@@ -0,0 +1,68 @@
+import importlib
+import sys
+
+import pytest
+
+from src.Airbnb.pipelines.Prediction_Pipeline import CustomData
+
+LISTING = {
+    'property_type': 'Apartment', 'room_type': 'Entire home/apt', 'amenities': 10, 'accommodates': 2,
+    'bathrooms': 1.0, 'bed_type': 'Real Bed', 'cancellation_policy': 'flexible', 'cleaning_fee': 'True',
+    'city': 'NYC', 'host_has_profile_pic': 't', 'host_identity_verified': 't', 'host_response_rate': 100,
+    'instant_bookable': 'f', 'latitude': 40.73, 'longitude': -73.99, 'number_of_reviews': 10,
+    'review_scores_rating': 95, 'bedrooms': 1, 'beds': 1
+}
+
+INVALID = [
+    ('property_type', ['a']),
+    ('property_type', 1),
+    ('city', True),
+    ('room_type', {'name': 'Private room'}),
+    ('accommodates', 'nan'),
+    ('accommodates', True),
+    ('accommodates', [2]),
+    ('bathrooms', float('nan')),
+    ('bathrooms', 'inf'),
+    ('latitude', 1e400),
+    ('longitude', '-1e400'),
+    ('number_of_reviews', 'ten'),
+]
+
+
+def test_valid_record_is_converted():
+    item = CustomData.from_record(dict(LISTING, accommodates='3', latitude='40.5', host_has_profile_pic=True))
+    assert item.accommodates == 3
+    assert item.latitude == 40.5
+    assert item.host_has_profile_pic == 't'
+
+
+@pytest.mark.parametrize('field, value', INVALID)
+def test_invalid_values_are_rejected(field, value):
+    with pytest.raises(ValueError, match=f'invalid value for {field}'):
+        CustomData.from_record(dict(LISTING, **{field: value}))
+
+
+def test_missing_fields_are_reported():
+    record = dict(LISTING)
+    del record['city']
+    with pytest.raises(ValueError, match='missing fields: city'):
+        CustomData.from_record(record)
+
+
+def test_batch_endpoint_reports_invalid_rows(tmp_path, monkeypatch):
+    # Scratch working directory without artifacts: every row is rejected before scoring.
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('AIRBNB_LAZY_STARTUP', '0')
+    sys.modules.pop('app', None)
+    app = importlib.import_module('app')
+    try:
+        records = [dict(LISTING, **{field: value}) for field, value in INVALID]
+        response = app.app.test_client().post('/predict/batch', json=records)
+        body = response.get_json()
+        assert response.status_code == 200
+        assert body['failed'] == len(records)
+        assert [entry['index'] for entry in body['predictions']] == list(range(len(records)))
+        assert all('invalid value for' in entry['error'] for entry in body['predictions'])
+    finally:
+        app.db.close()
+        sys.modules.pop('app', None)
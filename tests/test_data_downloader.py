@@ -0,0 +1,161 @@
+import gzip
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.data_downloader import AirbnbDataDownloader
+
+BODY = gzip.compress(b"id,price\n" + b"".join(b"%d,$%d.00\n" % (i, 50 + i % 100) for i in range(20000)))
+
+
+class StandIn:
+    """
+    Local HTTP server scripted per path: each request pops the next response spec
+    (the last one repeats). A spec is a dict with any of status, body, etag, delay
+    (seconds before responding) and truncate (bytes actually sent of a full Content-Length).
+    Range requests get a 206 for the remaining bytes.
+    """
+
+    def __init__(self):
+        self.routes = {}
+        self.requests = []
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stand_in.requests.append((self.path, dict(self.headers)))
+                specs = stand_in.routes.get(self.path, [{'status': 404}])
+                spec = specs.pop(0) if len(specs) > 1 else specs[0]
+                time.sleep(spec.get('delay', 0))
+
+                status, body, etag = spec.get('status', 200), spec.get('body', BODY), spec.get('etag', '"v1"')
+                if status == 200 and etag and self.headers.get('If-None-Match') == etag:
+                    status = 304
+                if status == 200 and self.headers.get('Range'):
+                    body = body[int(self.headers['Range'].split('=')[1].rstrip('-')):]
+                    status = 206
+                if status not in (200, 206):
+                    body = b''
+
+                self.send_response(status)
+                if etag:
+                    self.send_header('ETag', etag)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body[:spec.get('truncate', len(body))])
+                if 'truncate' in spec:
+                    self.close_connection = True
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server.server_address[1]}{path}"
+
+
+@pytest.fixture
+def stand_in():
+    server = StandIn()
+    server.thread.start()
+    yield server
+    server.server.shutdown()
+    server.server.server_close()
+
+
+@pytest.fixture
+def downloader(tmp_path):
+    return AirbnbDataDownloader(output_dir=str(tmp_path), min_interval=0, retries=2, backoff=0, timeout=0.5)
+
+
+def _target(downloader):
+    return os.path.join(downloader.raw_dir, "NYC_Q4_2025_listings.csv.gz")
+
+
+def _read(filepath):
+    with open(filepath, 'rb') as f:
+        return f.read()
+
+
+def test_download_then_revalidate_unchanged(stand_in, downloader):
+    stand_in.routes['/a.csv.gz'] = [{}]
+    filepath = _target(downloader)
+
+    assert downloader._fetch(stand_in.url('/a.csv.gz'), filepath) == 'downloaded'
+    assert _read(filepath) == BODY
+    assert downloader._fetch(stand_in.url('/a.csv.gz'), filepath) == 'unchanged'
+    assert stand_in.requests[-1][1].get('If-None-Match') == '"v1"'
+
+
+@pytest.mark.parametrize('status, label', [(403, 'blocked'), (404, 'missing')])
+def test_blocked_or_missing_without_local_copy(stand_in, downloader, status, label):
+    stand_in.routes['/a.csv.gz'] = [{'status': status}]
+    filepath = _target(downloader)
+
+    assert downloader._fetch(stand_in.url('/a.csv.gz'), filepath) == label
+    assert not os.path.exists(filepath)
+
+
+@pytest.mark.parametrize('status', [403, 404])
+def test_verified_copy_kept_when_revalidation_is_refused(stand_in, downloader, status):
+    stand_in.routes['/a.csv.gz'] = [{}, {'status': status}]
+    filepath = _target(downloader)
+
+    assert downloader._fetch(stand_in.url('/a.csv.gz'), filepath) == 'downloaded'
+    assert downloader._fetch(stand_in.url('/a.csv.gz'), filepath) == 'stale'
+    assert _read(filepath) == BODY
+    assert downloader._download_city('NYC', [('Q4_2025', stand_in.url('/a.csv.gz'))]) == filepath
+
+
+def test_slow_response_retries_then_fails(stand_in, downloader):
+    stand_in.routes['/a.csv.gz'] = [{'delay': 1.0}]
+    filepath = _target(downloader)
+
+    assert downloader._fetch(stand_in.url('/a.csv.gz'), filepath) == 'failed'
+    assert len(stand_in.requests) == downloader.retries
+    assert not os.path.exists(filepath)
+
+
+def test_slow_revalidation_keeps_local_copy(stand_in, downloader):
+    stand_in.routes['/a.csv.gz'] = [{}, {'delay': 1.0}]
+    filepath = _target(downloader)
+
+    assert downloader._fetch(stand_in.url('/a.csv.gz'), filepath) == 'downloaded'
+    assert downloader._fetch(stand_in.url('/a.csv.gz'), filepath) == 'stale'
+    assert _read(filepath) == BODY
+
+
+def test_truncated_download_is_resumed(stand_in, downloader):
+    # Cut on a chunk boundary, so the received half is on disk in the .part when the connection breaks.
+    downloader.CHUNK_SIZE = 4096
+    cut = len(BODY) // 2 // 4096 * 4096
+    stand_in.routes['/a.csv.gz'] = [{'truncate': cut}, {}]
+    filepath = _target(downloader)
+
+    assert downloader._fetch(stand_in.url('/a.csv.gz'), filepath) == 'downloaded'
+    assert _read(filepath) == BODY
+    assert not os.path.exists(filepath + ".part")
+    assert stand_in.requests[-1][1].get('Range') == f"bytes={cut}-"
+
+
+def test_corrupt_download_is_restarted(stand_in, downloader):
+    stand_in.routes['/a.csv.gz'] = [{'body': BODY[:-8] + b'\0' * 8}, {}]
+    filepath = _target(downloader)
+
+    assert downloader._fetch(stand_in.url('/a.csv.gz'), filepath) == 'downloaded'
+    assert _read(filepath) == BODY
+    assert 'Range' not in stand_in.requests[-1][1]
+
+
+def test_city_falls_back_to_older_candidate(stand_in, downloader):
+    stand_in.routes['/old.csv.gz'] = [{}]
+    candidates = [('Q4_2025', stand_in.url('/new.csv.gz')), ('Q3_2025', stand_in.url('/old.csv.gz'))]
+
+    filepath = downloader._download_city('NYC', candidates)
+    assert filepath == os.path.join(downloader.raw_dir, "NYC_Q3_2025_listings.csv.gz")
+    assert _read(filepath) == BODY
@@ -0,0 +1,81 @@
+import os
+import threading
+
+import pytest
+
+from src.Airbnb.database import Database
+
+
+@pytest.fixture
+def databases(tmp_path, monkeypatch):
+    # Two Database objects on one file stand in for two workers.
+    monkeypatch.chdir(tmp_path)
+    ours, theirs = Database(db_name='history.db'), Database(db_name='history.db')
+    yield ours, theirs
+    ours.close()
+    theirs.close()
+
+
+def _prices(history):
+    return [row[5] for row in history]
+
+
+def test_own_writes_do_not_reload_history(databases):
+    db, _ = databases
+    db.get_history()
+    reloads = db.history_reloads
+    for price in (1.0, 2.0, 3.0):
+        db.insert_prediction('NYC', 'Apartment', 'Entire home/apt', 2, price)
+    assert _prices(db.get_history()) == [3.0, 2.0, 1.0]
+    assert db.history_reloads == reloads
+
+
+def test_foreign_commit_is_picked_up(databases):
+    db, other = databases
+    db.insert_prediction('NYC', 'Apartment', 'Entire home/apt', 2, 1.0)
+    db.get_history()
+    other.insert_prediction('LA', 'House', 'Private room', 1, 2.0)
+    assert _prices(db.get_history()) == [2.0, 1.0]
+
+
+def test_foreign_commit_with_unchanged_file_stats_is_picked_up(databases):
+    # After a checkpoint the WAL is rewritten from the start at the same size, and on a filesystem
+    # with coarse timestamps the mtimes repeat too: file stats cannot tell that anything changed.
+    db, other = databases
+    other.insert_prediction('LA', 'House', 'Private room', 1, 1.0)
+    other.get_connection().execute('PRAGMA wal_checkpoint(RESTART)')
+    other.insert_prediction('LA', 'House', 'Private room', 1, 1.5)
+    db.get_history()
+    stats = {path: os.stat(path) for path in (db.db_name, db.db_name + '-wal')}
+    other.get_connection().execute('PRAGMA wal_checkpoint(RESTART)')
+    other.insert_prediction('LA', 'House', 'Private room', 1, 2.0)
+    for path, stat in stats.items():
+        assert os.path.getsize(path) == stat.st_size
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert _prices(db.get_history()) == [2.0, 1.5, 1.0]
+
+
+def test_writes_from_other_threads_keep_history_cached(databases):
+    db, _ = databases
+    db.get_history()
+    reloads = db.history_reloads
+    threads = [threading.Thread(target=db.insert_prediction, args=('NYC', 'Apartment', 'Entire home/apt', 2, float(i)))
+               for i in range(5)]
+    for thread in threads:
+        thread.start()
+        thread.join()
+    assert sorted(_prices(db.get_history())) == [0.0, 1.0, 2.0, 3.0, 4.0]
+    assert db.history_reloads == reloads
+
+
+def test_write_behind_history_includes_unflushed_rows(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    db = Database(db_name='history.db', write_behind=True, flush_interval=60)
+    try:
+        db.insert_prediction('NYC', 'Apartment', 'Entire home/apt', 2, 1.0)
+        assert _prices(db.get_history()) == [1.0]
+        db.flush()
+        assert _prices(db.get_history()) == [1.0]
+        assert db.flushed == 1
+    finally:
+        db.close()
@@ -0,0 +1,34 @@
+import threading
+import time
+
+from src.Airbnb.pipelines.Micro_batching import MicroBatcher
+
+
+def test_batches_concurrent_requests_in_order():
+    batcher = MicroBatcher(lambda items: [item * 2 for item in items], max_batch_size=64, max_wait_ms=50)
+    futures = [batcher.submit([i, i + 100]) for i in range(4)]
+    assert [list(future.result(timeout=5)) for future in futures] == [[i * 2, (i + 100) * 2] for i in range(4)]
+    assert batcher.stats()['requests'] == 4
+
+
+def test_time_behind_a_running_batch_is_reported_as_queue_wait():
+    started, release = threading.Event(), threading.Event()
+
+    def predict_fn(items):
+        if items == ['slow']:
+            started.set()
+            release.wait(5)
+        return items
+
+    batcher = MicroBatcher(predict_fn, max_wait_ms=1)
+    first = batcher.submit(['slow'])
+    assert started.wait(5)
+    second = batcher.submit(['fast'])
+    time.sleep(0.2)
+    release.set()
+    first.result(timeout=5)
+    second.result(timeout=5)
+
+    stats = batcher.stats()
+    assert stats['queue_wait_ms']['max'] >= 200
+    assert stats['added_wait_ms']['max'] < 200